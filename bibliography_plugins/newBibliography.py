@@ -1,9 +1,11 @@
-from ..external.bibtex import Parser
+from ..external.bibtex import Lexer, Parser, tex
+from ..external.bibtex.chunks import parse_chunks
 from ..external.bibtex.names import Name
-from ..external.bibtex.tex import tokenize_list
+from ..external.bibtex.tex import MEMO_SIZE, lru_cache, tokenize_list
 
 from ..external import latex_chars
-from ..latextools_utils import bibcache
+from ..latextools_utils import bibcache, bibindex
+from ..latextools_utils.settings import get_setting
 
 import codecs
 from collections import Mapping
@@ -13,6 +15,12 @@ import traceback
 # LaTeX -> Unicode decoder
 latex_chars.register()
 
+# unnecessary fields which are left out of the bib entries to save some space
+# and time loading and reloading them
+SKIPPED_FIELDS = [
+    'abstract', 'annotation', 'annote', 'execute', 'langidopts', 'options'
+]
+
 def _get_people_long(people):
     return u' and '.join([str(x) for x in people])
 
@@ -23,33 +31,28 @@ def _get_people_short(people):
         return people[0].last if people[0].last != '' else people[0].first + \
             u', et al.'
 
-def remove_latex_commands(s):
+# removes any LaTeX commands or brackets from a string, keeping their
+# contents; the results are memoized, as the same values occur in many entries
+remove_latex_commands = lru_cache(maxsize=MEMO_SIZE)(tex.remove_latex_commands)
+
+def get_memo_info():
     u'''
-    Simple function to remove any LaTeX commands or brackets from the string,
-    replacing it with its contents.
+    returns a dict of the cache_info() of the memoized latex decoding and
+    remove_latex_commands(), e.g., to report their hit rates
     '''
-    chars = []
-    FOUND_SLASH = False
-
-    for c in s:
-        if c == '{':
-            # i.e., we are entering the contents of the command
-            if FOUND_SLASH:
-                FOUND_SLASH = False
-        elif c == '}':
-            pass
-        elif c == '\\':
-            FOUND_SLASH = True
-        elif not FOUND_SLASH:
-            chars.append(c)
-        elif c.isspace():
-            FOUND_SLASH = False
-
-    return ''.join(chars)
+    result = {}
+    info = latex_chars.get_memo_info()
+    if info is not None:
+        result['latex_decode'] = info
+    if hasattr(remove_latex_commands, 'cache_info'):
+        result['remove_latex_commands'] = remove_latex_commands.cache_info()
+    return result
 
 # wrapper to implement a dict-like interface for bibliographic entries
 # returning formatted value, if it is available
 class EntryWrapper(Mapping):
+    __slots__ = ('entry',)
+
     def __init__(self, entry):
         self.entry = entry
 
@@ -104,27 +107,37 @@ class EntryWrapper(Mapping):
 
 class NewBibliographyPlugin:
 
-    def get_entries(self, *bib_files):
+    def get_generation(self, *bib_files):
+        return bibcache.get_generation('new', bib_files)
+
+    def get_entries(self, *bib_files, prefix=None):
         entries = []
-        parser = Parser()
+        parser = Parser(Lexer(skip_fields=SKIPPED_FIELDS))
 
         for bibfname in bib_files:
             bib_cache = bibcache.BibCache("new", bibfname)
             try:
-                cached_entries = bib_cache.get()
+                cached_entries = bib_cache.find(prefix)
                 entries.extend(cached_entries)
                 continue
             except:
                 pass
 
             try:
-                bibf = codecs.open(bibfname, 'r', 'UTF-8', 'ignore')  # 'ignore' to be safe
+                bib_contents, fingerprint = bibcache.read_bib_file(bibfname)
             except IOError:
                 print("Cannot open bibliography file %s !" % (bibfname,))
                 sublime.status_message("Cannot open bibliography file %s !" % (bibfname,))
                 continue
             else:
-                bib_data = parser.parse(bibf.read())
+                # only the chunks of the file which have changed since it
+                # was last cached are parsed again; the experimental
+                # bib_parse_processes setting parses many of them in that
+                # many forked processes, while the default of 1 parses them
+                # all in the plugin host
+                bib_data, chunks = parse_chunks(
+                    bib_contents, bib_cache.get_chunks(), parser,
+                    get_setting('bib_parse_processes', 1))
 
                 print ('Loaded %d bibitems' % (len(bib_data)))
 
@@ -134,30 +147,19 @@ class NewBibliographyPlugin:
                     if entry.entry_type in ('xdata', 'comment', 'string'):
                         continue
 
-                    # purge some unnecessary fields from the bib entry to save
-                    # some space and time reloading
-                    for k in [
-                        'abstract', 'annotation', 'annote', 'execute',
-                        'langidopts', 'options'
-                    ]:
-                        if k in entry:
-                            del entry[k]
-
                     bib_entries.append(EntryWrapper(entry))
 
                 try:
-                    bib_cache.set(bib_entries)
-                    fmt_entries = bib_cache.get()
+                    bib_cache.set(bib_entries, fingerprint, chunks)
+                    fmt_entries = bib_cache.find(prefix)
                     entries.extend(fmt_entries)
                 except:
                     traceback.print_exc()
                     print("Using bibliography without caching it")
+                    if prefix:
+                        bib_entries = bibindex.filter_entries(
+                            bib_entries, prefix)
                     entries.extend(bib_entries)
-            finally:
-                try:
-                    bibf.close()
-                except:
-                    pass
 
             print("Found %d total bib entries" % (len(entries),))
         return entries
@@ -1,5 +1,5 @@
 from ..external import latex_chars
-from ..latextools_utils import bibcache
+from ..latextools_utils import bibcache, bibindex
 
 import codecs
 import re
@@ -38,25 +38,28 @@ latex_chars.register()
 
 class TraditionalBibliographyPlugin:
 
-    def get_entries(self, *bib_files):
+    def get_generation(self, *bib_files):
+        return bibcache.get_generation('trad', bib_files)
+
+    def get_entries(self, *bib_files, prefix=None):
         entries = []
         for bibfname in bib_files:
             bib_cache = bibcache.BibCache("trad", bibfname)
             try:
-                cached_entries = bib_cache.get()
+                cached_entries = bib_cache.find(prefix)
                 entries.extend(cached_entries)
                 continue
             except:
                 pass
 
             try:
-                bibf = codecs.open(bibfname, 'r', 'UTF-8', 'ignore')  # 'ignore' to be safe
+                bib_contents, fingerprint = bibcache.read_bib_file(bibfname)
             except IOError:
                 print("Cannot open bibliography file %s !" % (bibfname,))
                 sublime.status_message("Cannot open bibliography file %s !" % (bibfname,))
                 continue
             else:
-                bib_data = bibf.readlines()
+                bib_data = bib_contents.splitlines(True)
                 bib_entries = []
 
                 entry = {}
@@ -108,18 +111,16 @@ class TraditionalBibliographyPlugin:
                 print ('Loaded %d bibitems' % (len(bib_entries)))
 
                 try:
-                    bib_cache.set(bib_entries)
-                    fmt_entries = bib_cache.get()
+                    bib_cache.set(bib_entries, fingerprint)
+                    fmt_entries = bib_cache.find(prefix)
                     entries.extend(fmt_entries)
                 except:
                     traceback.print_exc()
                     print("Using bibliography without caching it")
+                    if prefix:
+                        bib_entries = bibindex.filter_entries(
+                            bib_entries, prefix)
                     entries.extend(bib_entries)
-            finally:
-                try:
-                    bibf.close()
-                except:
-                    pass
 
             print("Found %d total bib entries" % (len(entries),))
         return entries
@@ -3,7 +3,8 @@ This module implements the cite-completion behaviour, largely by relying on
 implementations registered with latextools_plugin and configured using the
 `bibliograph_plugins` configuration key.
 
-At present, there is one supported method on custom plugins.
+At present, there are two supported methods on custom plugins, of which only
+`get_entries` is required.
 
 `get_entries`:
     This method should take a sequence of bib_files and return a sequence of
@@ -14,14 +15,29 @@ At present, there is one supported method on custom plugins.
     entries that have no `journal` but use the `journaltitle` field. Plugins
     can override this behaviour, however, by explicitly setting a value for
     whatever key they like.
+
+    `get_entries` is also passed a `prefix` keyword argument, which is either
+    None or the lower-cased text the user has typed so far. If it is set,
+    only the entries whose `<prefix_match>` string contains the prefix should
+    be returned, in their usual order.
+
+`get_generation`:
+    This optional method takes the same sequence of bib_files and returns a
+    hashable value identifying the entries `get_entries` currently returns
+    for them, or None if it cannot tell. As long as the value stays the same,
+    the matches for a prefix are narrowed down from the matches for a
+    shorter prefix instead of calling `get_entries` again. Plugins without
+    this method are always asked for the entries.
 '''
 import sublime
 from .latextools_utils.kpsewhich import kpsewhich
-from .latextools_utils import bibformat
+from .latextools_utils import bibformat, bibindex
 from .latextools_utils.settings import get_setting
 
+import collections
 import os
 import re
+import threading
 
 import traceback
 
@@ -329,7 +345,58 @@ def run_plugin_command(command, *args, expect_result=True, **kwargs):
     return result
 
 
-def get_cite_completions(view):
+class NarrowingSession(object):
+    '''
+    the result of the last prefix search for cite completions in a view
+
+    since every entry matching a prefix also matches all shorter prefixes
+    of it, a search for an extension of the last prefix only needs to look
+    at the last matches, provided the bib files have not changed in between
+    '''
+
+    # number of views to keep sessions for
+    MAX_SESSIONS = 16
+
+    def __init__(self, generation, lower_prefix, matches):
+        self.generation = generation
+        self.lower_prefix = lower_prefix
+        self.matches = matches
+
+    def narrow(self, generation, lower_prefix):
+        '''
+        returns the matches for lower_prefix or None if they cannot be
+        derived from the matches of this session
+        '''
+        if (
+            generation is None or
+            generation != self.generation or
+            not lower_prefix.startswith(self.lower_prefix)
+        ):
+            return None
+
+        if lower_prefix != self.lower_prefix:
+            self.matches = bibindex.filter_entries(self.matches, lower_prefix)
+            self.lower_prefix = lower_prefix
+
+        return self.matches
+
+
+# maps view ids to their NarrowingSession, least recently used first
+_narrowing_sessions = collections.OrderedDict()
+_narrowing_sessions_lock = threading.Lock()
+
+
+def _get_generation(bib_files):
+    # plugins need not implement get_generation, in which case the matches
+    # are never narrowed down
+    try:
+        return run_plugin_command(
+            'get_generation', *bib_files, expect_result=False)
+    except BibPluginError:
+        return None
+
+
+def get_cite_completions(view, prefix=None):
     bib_files = find_bib_files(view)
     print("Bib files found: ")
     print(repr(bib_files))
@@ -338,7 +405,36 @@ def get_cite_completions(view):
         # sublime.error_message("No bib files found!") # here we can!
         raise NoBibFilesError()
 
-    completions = run_plugin_command('get_entries', *bib_files)
+    if not prefix:
+        return run_plugin_command('get_entries', *bib_files)
+
+    lower_prefix = prefix.lower()
+    view_id = view.id()
+
+    generation = _get_generation(bib_files)
+
+    with _narrowing_sessions_lock:
+        session = _narrowing_sessions.pop(view_id, None)
+
+    completions = None
+    if session is not None:
+        completions = session.narrow(generation, lower_prefix)
+
+    if completions is None:
+        completions = run_plugin_command(
+            'get_entries', *bib_files, prefix=lower_prefix)
+
+        if generation is None:
+            # the entries have only just been cached
+            generation = _get_generation(bib_files)
+
+        session = NarrowingSession(generation, lower_prefix, completions)
+
+    if session.generation is not None:
+        with _narrowing_sessions_lock:
+            _narrowing_sessions[view_id] = session
+            while len(_narrowing_sessions) > NarrowingSession.MAX_SESSIONS:
+                _narrowing_sessions.popitem(last=False)
 
     return completions
 
@@ -361,7 +457,7 @@ class CitePlugin:
             return []
 
         try:
-            completions = get_cite_completions(view)
+            completions = get_cite_completions(view, prefix)
         except NoBibFilesError:
             print("No bib files found!")
             sublime.status_message("No bib files found!")
@@ -375,13 +471,6 @@ class CitePlugin:
             sublime.status_message(message)
             return []
 
-        if prefix:
-            lower_prefix = prefix.lower()
-            completions = [
-                c for c in completions
-                if _is_prefix(lower_prefix, c)
-            ]
-
         if len(completions) == 0:
             return []
 
@@ -410,7 +499,7 @@ class CitePlugin:
     @staticmethod
     def get_completions(view, prefix, line):
         try:
-            completions = get_cite_completions(view)
+            completions = get_cite_completions(view, prefix)
         except NoBibFilesError:
             sublime.error_message("No bib files found!")
             return
@@ -423,13 +512,6 @@ class CitePlugin:
             )
             return
 
-        if prefix:
-            lower_prefix = prefix.lower()
-            completions = [
-                c for c in completions
-                if _is_prefix(lower_prefix, c)
-            ]
-
         completions_length = len(completions)
         if completions_length == 0:
             return
@@ -475,10 +557,3 @@ class CitePlugin:
     @staticmethod
     def is_enabled():
         return get_setting('cite_auto_trigger', True)
-
-
-def _is_prefix(lower_prefix, entry):
-    try:
-        return lower_prefix in entry["<prefix_match>"]
-    except:     # noqa
-        return lower_prefix in bibformat.create_prefix_match_str(entry)
@@ -0,0 +1,421 @@
+'''
+support for parsing bibtex files one chunk at a time
+
+a chunk is the part of a file from the @ starting a preamble, string, comment
+or entry up to the @ starting the next one, i.e., the places where the lexer
+would be outside any entry. as each chunk holds a single item, it can be
+parsed on its own and the results of parsing an unchanged chunk can be reused
+after the rest of the file has been modified.
+
+the result of parsing a chunk only depends on its text and the values of the
+@string macros it uses, so a parsed chunk is reused only if both are the same
+'''
+
+from .lexer import (
+    COMMENT, ENTRY_START, ENTRY_TYPE, PREAMBLE, STRING, Lexer, skip_brackets,
+    skip_quoted
+)
+from .model import Database
+from .parser import Parser
+
+from collections import namedtuple
+import hashlib
+import os
+import re
+import traceback
+
+__all__ = ['ParsedChunk', 'parse_chunks', 'split_chunks']
+
+ParsedChunk = namedtuple(
+    'ParsedChunk', ['used_macros', 'macros', 'preambles', 'entries']
+)
+
+_ENTRY_BREAK = re.compile(r'[{}"]')
+
+
+def split_chunks(code):
+    '''
+    splits code at the start of each top-level item, returning the list of
+    chunks; any text before the first item is dropped, as the lexer would
+    ignore it anyway
+
+    this follows the way the lexer finds the end of an item, so that, for
+    any well-formed file, parsing the chunks one after the other gives the
+    same results as parsing the whole file
+    '''
+    chunks = []
+    code_len = len(code)
+
+    start = None
+    i = 0
+    while i < code_len:
+        match = ENTRY_START.search(code, i)
+        if not match:
+            break
+
+        at = match.start()
+        if start is not None:
+            chunks.append(code[start:at])
+        start = at
+
+        match = COMMENT.match(code, at)
+        if match:
+            # comments only extend to the end of the line
+            i = match.end()
+            continue
+
+        match = (
+            PREAMBLE.match(code, at) or
+            STRING.match(code, at) or
+            ENTRY_TYPE.match(code, at + 1)
+        )
+        if not match:
+            # the lexer will report the error
+            break
+
+        i = _find_item_end(code, match.end())
+
+    if start is not None:
+        chunks.append(code[start:])
+
+    return chunks
+
+
+def _find_item_end(code, i):
+    '''
+    returns the index after the } which closes the item whose contents start
+    at i, or the length of code if it is not closed
+    '''
+    code_len = len(code)
+    while True:
+        match = _ENTRY_BREAK.search(code, i)
+        if not match:
+            return code_len
+
+        matched = match.group(0)
+        if matched == '}':
+            return match.end()
+        elif matched == '{':
+            i = skip_brackets(code, match.end())
+        else:
+            i = skip_quoted(code, match.end())
+
+        if i is None:
+            return code_len
+
+
+def parse_chunks(code, chunk_cache=None, parser=None, processes=1):
+    '''
+    parses code chunk by chunk, returning a tuple of the resulting Database
+    and a dict of the ParsedChunks, which can be passed as the chunk_cache
+    when parsing a later version of the same file
+
+    :param code:
+        the contents of the bibtex file
+
+    :param chunk_cache:
+        the dict returned by an earlier call; chunks found in it are only
+        parsed again if a macro they use has changed
+
+    :param parser:
+        the Parser to parse the changed chunks with
+
+    :param processes:
+        if greater than 1 and there are at least PARALLEL_MIN_CHUNKS chunks
+        to parse, they are parsed by a pool of this many processes; the
+        Lexer of the parser must then be a Lexer from this package, since
+        the processes use a Lexer with the same skip_fields. this is
+        experimental and only done where the processes can be forked; if
+        they cannot be started, the chunks are parsed in this process
+    '''
+    if chunk_cache is None:
+        chunk_cache = {}
+    if parser is None:
+        parser = Parser()
+
+    database = Database()
+    chunks = {}
+
+    # the @string chunks are parsed first, in order, so that the macros
+    # defined before each of the other chunks are known; those are then
+    # parsed in batches of consecutive chunks which see the same macros
+    parsed_chunks = []
+    batches = []
+    batch = None
+
+    # the chunks run up to the end of code, so the line and column at which
+    # each of them starts can be worked out from the ones before it
+    code_chunks = split_chunks(code)
+    position = _get_end_position(
+        (0, 0), code[:len(code) - sum(len(chunk) for chunk in code_chunks)]
+    )
+    for chunk in code_chunks:
+        key = hashlib.md5(chunk.encode('utf-8')).digest()
+
+        parsed = chunks.get(key) or chunk_cache.get(key)
+        if parsed is None or not _uses_current_macros(parsed, database):
+            if STRING.match(chunk):
+                parsed = _parse_chunk(parser, chunk, database, position)
+            else:
+                if batch is None:
+                    batch = ([], [], [])
+                    batches.append((_get_macros(database), batch))
+                batch[0].append(len(parsed_chunks))
+                batch[1].append(chunk)
+                batch[2].append(position)
+                parsed = None
+
+        if parsed is not None:
+            chunks[key] = parsed
+
+            if parsed.macros:
+                batch = None
+                for macro, value in parsed.macros:
+                    database.add_macro(macro, value)
+
+        parsed_chunks.append((key, parsed))
+        position = _get_end_position(position, chunk)
+
+    for i, parsed in _parse_batches(batches, parser, processes):
+        key = parsed_chunks[i][0]
+        chunks[key] = parsed
+        parsed_chunks[i] = (key, parsed)
+
+    for _, parsed in parsed_chunks:
+        for preamble in parsed.preambles:
+            database.add_preamble(preamble)
+
+        for entry in parsed.entries:
+            database.add_entry(entry)
+
+    database.resolve_inheritance()
+    return database, chunks
+
+
+# the least number of chunks to parse for which parse_chunks() uses a pool of
+# processes; below this, starting the processes takes longer than it saves
+PARALLEL_MIN_CHUNKS = 2000
+
+
+def _get_macros(database):
+    return list(database._macros.items())
+
+
+def _get_end_position(position, text):
+    '''
+    returns the 0-based line and column at the end of text, which starts at
+    position
+    '''
+    line, column = position
+    newlines = text.count('\n')
+    if newlines:
+        return line + newlines, len(text) - text.rindex('\n') - 1
+    return line, column + len(text)
+
+
+def _parse_batches(batches, parser, processes):
+    '''
+    generates the position and ParsedChunk of each chunk in the batches
+    '''
+    results = None
+    chunk_count = sum(len(batch[0]) for _, batch in batches)
+    if processes > 1 and chunk_count >= PARALLEL_MIN_CHUNKS:
+        results = _parse_batches_in_pool(batches, parser, processes)
+
+    if results is None:
+        results = (
+            _parse_batch(parser, macros, batch[1], batch[2])
+            for macros, batch in batches
+        )
+
+    for (_, batch), parsed_batch in zip(batches, results):
+        for i, parsed in zip(batch[0], parsed_batch):
+            yield i, parsed
+
+
+def _get_fork_context():
+    '''
+    returns the multiprocessing context which starts processes by forking,
+    or None if there is none; the other ways to start them run
+    sys.executable, which is not a python interpreter inside sublime's
+    plugin host
+    '''
+    import multiprocessing
+
+    try:
+        return multiprocessing.get_context('fork')
+    except AttributeError:
+        # before python 3.4, processes are forked wherever that is possible
+        return multiprocessing if hasattr(os, 'fork') else None
+    except ValueError:
+        return None
+
+
+def _parse_batches_in_pool(batches, parser, processes):
+    '''
+    returns an iterator over the ParsedChunks of each batch, parsed by a pool
+    of processes, or None if the pool cannot be used
+
+    the forked processes only run the lexer and parser, so they do not use
+    any of the locks which the threads of the plugin might have held when
+    they were forked
+    '''
+    context = _get_fork_context()
+    if context is None:
+        return None
+
+    # about 4 batches per process, so that they all finish at about the
+    # same time
+    size = max(
+        1,
+        sum(len(batch[0]) for _, batch in batches) // (processes * 4)
+    )
+
+    skip_fields = parser.lexer.skip_fields
+    tasks = []
+    for macros, batch in batches:
+        chunks, positions = batch[1], batch[2]
+        for i in range(0, len(chunks), size):
+            tasks.append((
+                macros, chunks[i:i + size], positions[i:i + size], skip_fields
+            ))
+
+    try:
+        pool = context.Pool(processes)
+        try:
+            results = pool.map(_parse_task, tasks, chunksize=1)
+        except:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+    except SyntaxError:
+        raise
+    except Exception:
+        traceback.print_exc()
+        return None
+
+    return _join_task_results(batches, results)
+
+
+def _join_task_results(batches, results):
+    '''
+    generates the ParsedChunks of each batch, joining the results of the
+    tasks split from it
+    '''
+    results = iter(results)
+    for _, batch in batches:
+        parsed_batch = []
+        while len(parsed_batch) < len(batch[1]):
+            parsed_batch.extend(next(results))
+        yield parsed_batch
+
+
+def _parse_task(task):
+    macros, chunks, positions, skip_fields = task
+    parsed_batch = _parse_batch(
+        Parser(Lexer(skip_fields)), macros, chunks, positions
+    )
+
+    # the entries are added to the Database of the whole file anyway, so
+    # there is no need to send the Databases they were parsed into back
+    for parsed in parsed_batch:
+        for entry in parsed.entries:
+            entry.database = None
+
+    return parsed_batch
+
+
+def _parse_batch(parser, macros, chunks, positions):
+    '''
+    parses chunks which do not define any macros, returning the list of
+    ParsedChunks
+
+    :param macros:
+        the (key, value) pairs of the macros defined before the chunks
+
+    :param positions:
+        the 0-based line and column at which each chunk starts in the file
+    '''
+    database = Database()
+    for key, value in macros:
+        database.add_macro(key, value)
+
+    return [
+        _parse_chunk(parser, chunk, database, position)
+        for chunk, position in zip(chunks, positions)
+    ]
+
+
+def _lookup_macro(database, macro):
+    try:
+        return database.get_macro(macro)
+    except KeyError:
+        return None
+
+
+def _uses_current_macros(parsed, database):
+    return all(
+        _lookup_macro(database, macro) == value
+        for macro, value in parsed.used_macros
+    )
+
+
+def _parse_chunk(parser, chunk, database, position=(0, 0)):
+    chunk_database = _ChunkDatabase(database)
+
+    # the lexer reports the positions of errors relative to the start of
+    # the file rather than the chunk
+    lexer = parser.lexer
+    lexer.start_position = position
+    try:
+        parser.parse(chunk, chunk_database)
+    finally:
+        lexer.start_position = (0, 0)
+
+    return ParsedChunk(
+        tuple(chunk_database.used_macros.items()),
+        tuple(chunk_database.macros),
+        tuple(chunk_database._preamble),
+        [chunk_database[key] for key in chunk_database]
+    )
+
+
+class _ChunkDatabase(Database):
+    '''
+    the Database a single chunk is parsed into; macros not defined in the
+    chunk itself are looked up in the Database of the whole file, recording
+    the values they had
+    '''
+
+    def __init__(self, parent):
+        super(_ChunkDatabase, self).__init__()
+        self.parent = parent
+        self.macros = []
+        self.used_macros = {}
+        self._local_macros = {}
+
+    def add_macro(self, key, value):
+        self.macros.append((key, value))
+        self._local_macros[key.lower()] = value
+
+    def get_macro(self, key):
+        key = key.lower()
+        try:
+            return self._local_macros[key]
+        except KeyError:
+            pass
+
+        value = _lookup_macro(self.parent, key)
+        self.used_macros[key] = value
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def resolve_inheritance(self):
+        # the entries a chunk inherits from are usually in other chunks, so
+        # this is done for the Database of the whole file instead
+        pass
@@ -19,12 +19,13 @@ produced tokens:
     EOF             - EOF marker
 
 location information:
-    four co-ordinates for each token consisting of the first_line, first_column, last_line, and last_column
-    all 0-based
+    the start and end offsets of each token in the code; these can be turned
+    into a 0-based line and column using get_line_and_column()
 
 note that the EOF token does not have associated location_information
 '''
 
+from bisect import bisect_right
 import re
 
 __all__ = ['Lexer']
@@ -32,26 +33,56 @@ __all__ = ['Lexer']
 
 class Lexer(object):
 
-    def __init__(self):
+    def __init__(self, skip_fields=()):
+        '''
+        :param skip_fields:
+            the names of the fields to leave out of entries; their values are
+            skipped without producing any tokens for them or the key, which
+            saves most of the work of lexing and parsing fields such as
+            abstracts that are never used
+        '''
         super(Lexer, self).__init__()
+        self.skip_fields = frozenset(field.lower() for field in skip_fields)
         self.tokens = []
         self.code = ''
         self.code_len = 0
-        self.current_line = 0
-        self.current_column = 0
         self.current_index = 0
         self.in_entry = False
 
+        # the offsets at which each line of code starts, which are only
+        # computed when needed
+        self._line_starts = None
+
+        # the 0-based line and column at which code starts, if it is only a
+        # part of a file, so that errors report positions in the whole file
+        self.start_position = (0, 0)
+
     def tokenize(self, code):
+        '''
+        returns the list of all the tokens in code
+        '''
+        tokens = list(self.iter_tokens(code))
+        self.tokens = tokens
+        return tokens
+
+    def iter_tokens(self, code):
+        '''
+        generates the tokens in code as they are found, so that they can be
+        consumed without building the list of all tokens first
+
+        while this is running, self.tokens only holds the tokens found since
+        the last one was generated
+        '''
         self.code = code
         code_len = self.code_len = len(code)
 
         # reset values
-        self.tokens = []
-        self.current_line = 0
-        self.current_column = 0
+        tokens = self.tokens = []
         self.current_index = 0
         self.in_entry = False
+        self._line_starts = None
+
+        last_tag = None
 
         while self.current_index < code_len:
             if not self.in_entry:
@@ -69,16 +100,87 @@ class Lexer(object):
                     )
 
                     start_entry = False
-                elif self.tokens[-1][0] == 'ENTRY_START':
+
+                    # fields are only skipped in entries, not in @string or
+                    # @preamble
+                    if tokens and tokens[-1][0] == 'ENTRY_START':
+                        skip_fields = self.skip_fields
+                    else:
+                        skip_fields = None
+                elif last_tag == 'ENTRY_START':
                     consumed = (
                         self.entry_type_token()     or
                         self.token_error()
                     )
                 else:
-                    consumed = (
-                        self.whitespace_token()     or
-                        self.comma_token()          or
-                        self.key_token()            or
+                    consumed = self.entry_tokens(skip_fields)
+
+            self.current_index += consumed
+
+            if tokens:
+                last_tag = tokens[-1][0]
+                for token in tokens:
+                    yield token
+                del tokens[:]
+
+        yield ('EOF', '', {})
+
+    def entry_tokens(self, skip_fields=None):
+        '''
+        scans the tokens inside an entry up to and including its ENTRY_END,
+        leaving out the fields whose lower-cased key is in skip_fields
+
+        this is equivalent to repeatedly trying whitespace_token(),
+        comma_token(), key_token(), value_token(), quoted_string_token(),
+        identifier_token(), number_token(), hash_token() and entry_end_token()
+        in that order, but all of them are matched by the single ENTRY_TOKEN
+        pattern, which also skips any whitespace and commas before the token;
+        only values in brackets or quotes which contain line breaks or deeply
+        nested brackets are handed to their own methods
+        '''
+        code = self.code
+        code_len = self.code_len
+        append = self.tokens.append
+        start_index = index = self.current_index
+        skipping = False
+
+        while index < code_len:
+            match = ENTRY_TOKEN.match(code, index)
+
+            kind = match.lastgroup
+            if kind is None:
+                # only whitespace and commas
+                end = match.end()
+                if end == index:
+                    break
+                index = end
+                continue
+
+            start = match.start(kind)
+            if kind == 'KEY':
+                skipping = bool(skip_fields) and \
+                    match.group(_KEY_GROUP).lower() in skip_fields
+                if skipping:
+                    index = match.end()
+                    continue
+            elif skipping and kind != 'ENTRY_END':
+                if kind == 'COMPLEX_VALUE':
+                    if code[start] == '{':
+                        end = skip_brackets(code, start + 1)
+                    else:
+                        end = skip_quoted(code, start + 1)
+                else:
+                    end = match.end()
+
+                if end is not None:
+                    index = end
+                    continue
+
+            if kind == 'COMPLEX_VALUE':
+                tokens_len = len(self.tokens)
+                self.current_index = start
+                try:
+                    index = start + (
                         self.value_token()          or
                         self.quoted_string_token()  or
                         self.identifier_token()     or
@@ -87,15 +189,33 @@ class Lexer(object):
                         self.entry_end_token()      or
                         self.token_error()
                     )
+                finally:
+                    self.current_index = start_index
 
-            self.current_line, self.current_column = \
-                self.get_line_and_column(consumed)
+                if skipping:
+                    # an unbalanced value, which is consumed in the same way
+                    # as if it were not skipped
+                    del self.tokens[tokens_len:]
 
-            self.current_index += consumed
+                if not self.in_entry:
+                    break
+                continue
+
+            tag, value_group = _ENTRY_TOKEN_TAGS[kind]
+            value = match.group(value_group)
+            if tag == 'VALUE':
+                value = value.strip()
+            append((tag, value, (start, start + len(value))))
 
-        self.tokens.append(('EOF', '', {}))
+            index = match.end()
+            if tag == 'ENTRY_END':
+                self.in_entry = False
+                break
 
-        return self.tokens
+        if index == start_index:
+            return self.token_error()
+
+        return index - start_index
 
     def until_entry(self):
         match = ENTRY_START.search(self.code, self.current_index)
@@ -194,7 +314,6 @@ class Lexer(object):
                     bracket_depth += 1
                     value.append(matched)
                 else:
-                    self.current_line += 1
                     # consume space after new line replacing with 1 space
                     match = SPACE.match(self.code, i - 1)
                     if match:
@@ -249,7 +368,6 @@ class Lexer(object):
                         value.extend(['{', bracket_value, '}'])
                         i = new_i
                 else:
-                    self.current_line += 1
                     # consume space after new line replacing with 1 space
                     match = SPACE.match(self.code, i - 1)
                     if match:
@@ -302,38 +420,75 @@ class Lexer(object):
             self.code[self.current_index:].split('\n', 1)[0]
         ))
 
-    def get_line_and_column(self, offset=0):
-        if offset == 0:
-            return self.current_line, self.current_column
+    def get_line_and_column(self, index=None):
+        '''
+        returns the 0-based line and column of the offset index in the code,
+        which defaults to the current offset
+        '''
+        if index is None:
+            index = self.current_index
+
+        line_starts = self._line_starts
+        if line_starts is None:
+            line_starts = self._line_starts = [0]
+            line_starts.extend(
+                match.end() for match in NEWLINE.finditer(self.code)
+            )
+
+        line = bisect_right(line_starts, index) - 1
+        column = index - line_starts[line]
+
+        start_line, start_column = self.start_position
+        if line == 0:
+            column += start_column
+        return start_line + line, column
 
-        if offset >= self.code_len - self.current_index:
-            lines = self.code[self.current_index:].splitlines()
-        else:
-            lines = self.code[self.current_index:offset + self.current_index].splitlines()
+    def add_token(self, tag, value, offset=0, length=None):
+        if length is None:
+            length = len(value)
 
-        line_count = len(lines) - 1
+        start = self.current_index + offset
+        self.tokens.append((tag, value, (start, start + length)))
+
+def skip_brackets(code, i):
+    '''
+    returns the index after the } closing the bracket opened before i or None
+    if it is not closed
+    '''
+    depth = 1
+    while True:
+        match = BRACKET.search(code, i)
+        if not match:
+            return None
 
-        if line_count > 0:
-            column = len(lines[-1])
+        i = match.end()
+        if match.group(0) == '{':
+            depth += 1
         else:
-            column = self.current_column + offset
-
-        return (
-            self.current_line + line_count,
-            column
-        )
+            depth -= 1
+            if depth == 0:
+                return i
+
+
+def skip_quoted(code, i):
+    '''
+    returns the index after the " closing the quoted string started before i
+    or None if it is not closed; as in quoted_string_token(), a bracket which
+    is not closed is treated as part of the string
+    '''
+    while True:
+        match = QUOTE_OR_BRACKET.search(code, i)
+        if not match:
+            return None
 
-    def add_token(self, tag, value, offset=0, length=None):
-        if length is None:
-            length = len(value)
+        i = match.end()
+        if match.group(0) == '"':
+            return i
 
-        location_data = {}
-        location_data['first_line'], location_data['first_column'] = \
-            self.get_line_and_column(offset)
-        location_data['last_line'], location_data['last_column'] = \
-            self.get_line_and_column(offset + length)
+        end = skip_brackets(code, i)
+        if end is not None:
+            i = end
 
-        self.tokens.append((tag, value, location_data))
 
 # Roughly speaking, these are the tokens
 WHITESPACE          = re.compile(r'([\s\n]+)', re.UNICODE)
@@ -350,3 +505,42 @@ KEY                 = re.compile(r'([^\W\d][^,\s=]*)\s*=\s*', re.UNICODE)
 NEXT_QUOTE_BREAK    = re.compile(r'\n|"|\{')
 NEXT_BRACKET_BREAK  = re.compile(r'\{|}|\n')
 SPACE               = re.compile(r'\s+', re.UNICODE)
+NEWLINE             = re.compile(r'\n')
+BRACKET             = re.compile(r'[{}]')
+QUOTE_OR_BRACKET    = re.compile(r'["{]')
+
+# Matches any of the tokens inside an entry, trying them in the same order as
+# the *_token() methods, after skipping any whitespace and commas; values in
+# brackets or quotes are only matched if they contain no line breaks and no
+# brackets nested more than one level deep, otherwise COMPLEX_VALUE matches
+# their start
+ENTRY_TOKEN         = re.compile(r'[\s,]*(?:{0})?'.format('|'.join(
+    '(?P<{0}>{1})'.format(name, pattern) for name, pattern in [
+        ('KEY', KEY.pattern),
+        ('VALUE', r'\{([^{}\n]*(?:\{[^{}\n]*\}[^{}\n]*)*)\}'),
+        ('QUOTED_STRING', r'"([^"{\n]*(?:\{[^{}\n]*\}[^"{\n]*)*)"'),
+        ('COMPLEX_VALUE', r'(?=[{"])'),
+        ('IDENTIFIER', IDENTIFIER.pattern),
+        ('NUMBER', NUMBER.pattern),
+        ('HASH', '#'),
+        ('ENTRY_END', '}')
+    ]
+)), re.UNICODE)
+
+# the tag of the token produced for each group of ENTRY_TOKEN and the group
+# holding its value
+_ENTRY_TOKEN_TAGS = dict(
+    (name, (tag, ENTRY_TOKEN.groupindex[name] + offset))
+    for name, tag, offset in [
+        ('KEY', 'KEY', 1),
+        ('VALUE', 'VALUE', 1),
+        ('QUOTED_STRING', 'QUOTED_STRING', 1),
+        ('IDENTIFIER', 'IDENTIFIER', 0),
+        ('NUMBER', 'NUMBER', 0),
+        ('HASH', '#', 0),
+        ('ENTRY_END', 'ENTRY_END', 0)
+    ]
+)
+
+# the group holding the name of the key in a KEY match
+_KEY_GROUP = _ENTRY_TOKEN_TAGS['KEY'][1]
@@ -1,9 +1,23 @@
-from .utils import CaseInsensitiveOrderedDict
+from .utils import CaseInsensitiveOrderedDict, SharedKeyDict
 from collections import MutableMapping
 import sys
 
+try:
+    from sys import intern
+except ImportError:
+    pass
+
 __all__ = ['Database', 'Entry']
 
+# the fields an entry inherits nothing through; shared by all such entries,
+# so it must never be modified
+_NO_FIELDS = {}
+
+_MISSING = object()
+
+# the fields which are never inherited from an xdata entry
+_XDATA_EXCLUDED = ('crossref', 'xdata')
+
 if sys.version_info > (3, 0):
     def reraise(tp, value, tb=None):
         if value is None:
@@ -70,6 +84,81 @@ class Database(MutableMapping):
                 pass
         return entries
 
+    def resolve_inheritance(self):
+        '''
+        resolves the fields each entry inherits from the entries named by its
+        xdata and crossref fields once, so that looking up a field an entry
+        does not have no longer searches its crossref each time
+
+        fields of the entry itself take precedence over those of its xdata
+        entries, which take precedence over those of its crossref entry. this
+        must be called again after entries have been added or changed
+        '''
+        entries = self._entries
+        for entry in entries.values():
+            entry._inherited = None
+
+        for entry in entries.values():
+            self._resolve_entry(entry, set())
+
+    def _resolve_entry(self, entry, visiting):
+        '''
+        sets and returns entry._inherited; visiting holds the keys of the
+        entries whose fields are being resolved, to stop at cycles
+        '''
+        if entry._inherited is not None:
+            return entry._inherited
+
+        attributes = entry._attributes
+        xdata = attributes.get('xdata')
+        crossref = attributes.get('crossref')
+        if xdata is None and crossref is None:
+            entry._inherited = _NO_FIELDS
+            return _NO_FIELDS
+
+        key = entry.cite_key.lower()
+        visiting.add(key)
+
+        inherited = {}
+        if xdata is not None:
+            for parent in self._get_parents(xdata.split(','), visiting):
+                for field, value in self._get_fields(parent, visiting):
+                    if field not in _XDATA_EXCLUDED:
+                        inherited.setdefault(field, value)
+
+        if crossref is not None:
+            for parent in self._get_parents((crossref,), visiting):
+                for field, value in self._get_fields(parent, visiting):
+                    if field != 'crossref':
+                        inherited.setdefault(field, value)
+
+        for field in attributes:
+            inherited.pop(field, None)
+
+        visiting.discard(key)
+        entry._inherited = inherited or _NO_FIELDS
+        return entry._inherited
+
+    def _get_parents(self, keys, visiting):
+        entries = self._entries
+        for key in keys:
+            key = key.strip().lower()
+            if key in visiting:
+                continue
+
+            try:
+                yield entries[key]
+            except KeyError:
+                pass
+
+    def _get_fields(self, entry, visiting):
+        inherited = self._resolve_entry(entry, visiting)
+        for item in entry._attributes.items():
+            yield item
+
+        for item in inherited.items():
+            yield item
+
     def __getitem__(self, key):
         return self._entries[key]
 
@@ -88,11 +177,21 @@ class Database(MutableMapping):
 
 class Entry(MutableMapping):
 
+    # a bibliography may have hundreds of thousands of entries, so they have
+    # no __dict__ and keep their fields in a SharedKeyDict
+    __slots__ = (
+        'entry_type', 'cite_key', 'database', '_attributes', '_inherited'
+    )
+
     def __init__(self, entry_type, cite_key, *args, **kwargs):
-        self.entry_type = entry_type.lower()
+        self.entry_type = intern(entry_type.lower())
         self.cite_key = cite_key
         self.database = None
-        self._attributes = CaseInsensitiveOrderedDict(*args, **kwargs)
+        self._attributes = SharedKeyDict(*args, **kwargs)
+        # the fields inherited through crossref and xdata, keyed by their
+        # lower case names, or None if Database.resolve_inheritance() has
+        # not been run
+        self._inherited = None
 
     def get_crossref(self):
         if self.database is None:
@@ -107,6 +206,13 @@ class Entry(MutableMapping):
         if key is None:
             raise KeyError()
 
+        inherited = self._inherited
+        if inherited is not None:
+            value = self._attributes.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            return inherited[key.lower()]
+
         try:
             return self._attributes[key]
         except KeyError:
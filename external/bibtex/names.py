@@ -1,4 +1,4 @@
-from .tex import split_tex_string
+from .tex import MEMO_SIZE, _tokenize_list, lru_cache, split_tex_string
 from collections import namedtuple
 import sys
 
@@ -13,6 +13,7 @@ else:
 NameResult = namedtuple('NameResult', ['first', 'middle', 'prefix', 'last', 'generation'])
 
 
+@lru_cache(maxsize=MEMO_SIZE)
 def tokenize_name(name_str):
     u'''
     Takes a string representing a name and returns a NameResult breaking that
@@ -27,6 +28,8 @@ def tokenize_name(name_str):
     We try to follow the rules in BibTeXing relatively strictly, meaning that the
     first of these formats can result in unexpected results because it is more
     ambiguous with complex names.
+
+    The results are memoized, as the same names occur in many entries.
     '''
 
     def extract_middle_names(first):
@@ -133,6 +136,21 @@ def tokenize_name(name_str):
         raise ValueError(u'Unrecognised name format for "{0}"'.format(name_str))
 
 
+def get_memo_info():
+    '''
+    returns a dict of the cache_info() of the memoized tokenize_name() and
+    tokenize_list(), e.g., to report their hit rates
+    '''
+    return dict(
+        (name, func.cache_info())
+        for name, func in (
+            ('tokenize_name', tokenize_name),
+            ('tokenize_list', _tokenize_list)
+        )
+        if hasattr(func, 'cache_info')
+    )
+
+
 class Name(object):
     u'''
     Represents a BibLaTeX name entry. __str__ will return a name formatted in
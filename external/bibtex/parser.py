@@ -22,9 +22,12 @@ grammar (roughly):
     string = STRING KEY (VALUE | QUOTED_STRING) ENTRY_END;
     entry = ENTRY_START ENTRY_TYPE IDENTIFIER key_values ENTRY_END;
     key_values = (KEY field_value)*;
-    field_value = concatenated_values* | value;
-    concatenated_values = value # field_value;
+    field_value = value (# value)*;
     value = IDENTIFIER | NUMBER | VALUE | QUOTED_STRING;
+
+the parser is predictive: it decides what to parse next by looking at most
+one token ahead and never has to rewind; concatenated_value(), which parses
+a concatenation speculatively, is only kept for compatibility
 '''
 
 from .ast import *
@@ -40,6 +43,10 @@ if sys.version_info > (3, 0):
 
 __all__ = ['Parser']
 
+# field values longer than this, like titles and abstracts, rarely occur more
+# than once, so they are not interned
+MAX_INTERNED_LENGTH = 100
+
 
 class Parser(object):
 
@@ -52,19 +59,54 @@ class Parser(object):
         self._current_token = -1
         self._tokens_len = -1
         self._mark_locations = []
-
-    def parse(self, s):
-        self.tokens = self.lexer.tokenize(s)
+        self._token_stream = None
+        # the field values parsed so far, so that repeated values, like
+        # journal names, years or lists of authors, are kept only once
+        self._values = {}
+
+    def parse(self, s, database=None):
+        '''
+        parses s, returning the Database of its contents
+
+        the tokens are consumed as the lexer produces them and discarded once
+        the item they belong to has been parsed, so only the tokens of the
+        current item are kept in self.tokens
+
+        :param s:
+            the bibtex code to parse
+
+        :param database:
+            the Database to add the contents to; if None, a new Database is
+            created
+        '''
+        self.tokens = []
         self._current_token = 0
-        self._tokens_len = len(self.tokens)
+        self._tokens_len = 0
         self._mark_locations = []
+        try:
+            iter_tokens = self.lexer.iter_tokens
+        except AttributeError:
+            # a lexer which only produces the list of all tokens
+            iter_tokens = self.lexer.tokenize
+        self._token_stream = iter(iter_tokens(s))
 
-        if self._tokens_len < 0:
-            raise SyntaxError('could not find any entries')
+        if database is None:
+            database = Database()
+        self.database = database
 
-        self.database = database = Database()
+        try:
+            return self._parse_items(database)
+        finally:
+            self._token_stream = None
 
+    def _parse_items(self, database):
         while True:
+            # the tokens of the items already parsed are no longer needed
+            if self._current_token > 0:
+                del self.tokens[:self._current_token]
+                self._tokens_len -= self._current_token
+                self._current_token = 0
+
             try:
                 self._advance()
             except IndexError:
@@ -80,7 +122,7 @@ class Parser(object):
                 string = self.string()
                 database.add_macro(
                     string.key,
-                    self._handle_value(string.value)
+                    self._intern(self._handle_value(string.value))
                 )
             elif token_type == 'ENTRY_START':
                 entry_node = self.entry()
@@ -91,14 +133,16 @@ class Parser(object):
                 )
 
                 for field in entry_node.fields:
-                    entry[field.key] = self._handle_value(field.value)
+                    value = self._handle_value(field.value)
                     if field.key in Name.NAME_FIELDS:
-                        entry[field.key] = ' and '.join(
+                        value = ' and '.join(
                             (unicode(Name(s)) for s in
-                                tokenize_list(entry[field.key])))
+                                tokenize_list(value)))
+                    entry[field.key] = self._intern(value)
 
                 database.add_entry(entry)
             elif token_type == 'EOF':
+                database.resolve_inheritance()
                 return database
             else:
                 self.unexpected_token('preamble, string, entry_start, or eof')
@@ -107,12 +151,43 @@ class Parser(object):
         token_len = self._tokens_len
 
         current_token = self._current_token
-        if current_token >= token_len:
+        if current_token >= token_len and not self._next_token():
             raise IndexError('no more tokens')
 
         self.token_type, self.token_value, self.line_info = self.tokens[current_token]
         self._current_token += 1
 
+    def _next_token(self):
+        '''
+        reads the next token from the lexer into self.tokens, returning False
+        if there are none left
+        '''
+        if self._token_stream is None:
+            return False
+
+        try:
+            token = next(self._token_stream)
+        except StopIteration:
+            self._token_stream = None
+            return False
+
+        self.tokens.append(token)
+        self._tokens_len += 1
+        return True
+
+    def _peek(self):
+        '''
+        returns the type of the next token without consuming it or None if
+        there are no tokens left
+        '''
+        if (
+            self._current_token >= self._tokens_len and
+            not self._next_token()
+        ):
+            return None
+
+        return self.tokens[self._current_token][0]
+
     def _mark(self):
         self._mark_locations.append(self._current_token)
 
@@ -138,10 +213,8 @@ class Parser(object):
         node = PreambleNode()
 
         # contents are optional
-        try:
+        if self._peek() != 'ENTRY_END':
             node.contents = self.field_value()
-        except SyntaxError:
-            self._rewind()
 
         try:
             self._advance()
@@ -217,28 +290,45 @@ class Parser(object):
     def key_values(self):
         values = []
 
-        while True:
-            try:
-                self._advance()
-            except IndexError:
-                break
+        while self._peek() == 'KEY':
+            self._advance()
 
-            if self.token_type == 'KEY':
-                node = KeyValueNode()
-                node.key = self.token_value
-                node.value = self.field_value()
+            node = KeyValueNode()
+            node.key = self.token_value
+            node.value = self.field_value()
 
-                values.append(node)
-            else:
-                self._rewind()
-                break
+            values.append(node)
 
         return values
 
     def field_value(self):
-        return self.concatenated_value() or self.value()
+        '''
+        parses a value and any values concatenated to it, returning either
+        the value node or a ConcatenationNode
+
+        unlike concatenated_value(), each token is only visited once
+        '''
+        values = [self.value()]
+        while self._peek() == '#':
+            self._advance()
+            values.append(self.value())
+
+        node = values.pop()
+        while values:
+            lhs = values.pop()
+            rhs = node
+
+            node = ConcatenationNode()
+            node.lhs = lhs
+            node.rhs = rhs
+
+        return node
 
     def concatenated_value(self):
+        '''
+        parses a concatenation of values, returning False and rewinding to
+        the first token if there is none
+        '''
         self._mark()
         try:
             lhs = self.value()
@@ -292,10 +382,11 @@ class Parser(object):
         return node
 
     def unexpected_token(self, expecting=None):
+        # tokens only record their offsets, so the line and column are only
+        # worked out here
         try:
-            line    = self.line_info['first_line']
-            column  = self.line_info['first_column']
-        except (AttributeError, KeyError):
+            line, column = self.lexer.get_line_and_column(self.line_info[0])
+        except (AttributeError, IndexError, KeyError, TypeError):
             line, column = -1, -1
 
         if expecting is not None:
@@ -321,6 +412,14 @@ class Parser(object):
                 expecting
             ))
 
+    def _intern(self, value):
+        '''
+        returns the value parsed before which is equal to value, if any
+        '''
+        if len(value) > MAX_INTERNED_LENGTH:
+            return value
+        return self._values.setdefault(value, value)
+
     def _handle_value(self, value):
         if isinstance(value, ConcatenationNode):
             return ''.join((
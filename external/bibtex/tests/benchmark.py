@@ -0,0 +1,273 @@
+'''
+benchmarks for the bibtex library on a synthetic bibliography
+
+run from the directory containing the package, e.g.:
+    python -m <package>.external.bibtex.tests.benchmark [entries]
+
+entries defaults to 100000
+'''
+
+from ..lexer import Lexer
+from ..model import Entry
+from ..names import get_memo_info
+from ..parser import Parser
+from ..tex import remove_latex_commands, split_tex_string
+from ..utils import CaseInsensitiveOrderedDict
+from .tex_tests import remove_latex_commands_by_char
+from ...frozendict import frozendict
+from ... import latex_chars
+
+from bisect import bisect
+import codecs
+import random
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+FIRST_NAMES = [
+    'John', 'Jane', 'Ana', 'J{\\"o}rg', 'Li', 'Pierre', 'Maria',
+    'Fran{\\c{c}}ois', 'Ahmed', 'Wei'
+]
+
+LAST_NAMES = [
+    'Smith', 'M{\\"u}ller', 'de la Cruz', 'van Dijk', 'Zhang', 'Garcia',
+    'Okafor', 'Nguyen', 'Sch{\\"o}n', 'Brown'
+]
+
+WORDS = (
+    'analysis of deep learning methods for {IEEE} systems with $\\alpha$ '
+    'beta stable quantum networks graph theory'
+).split()
+
+JOURNALS = [
+    'Nature', '{IEEE} Transactions on Pattern Analysis', 'J. Chem. Phys.',
+    'Physical Review Letters'
+]
+
+
+def make_authors(count, r):
+    '''
+    returns a function choosing one of count distinct authors, where, as in a
+    real bibliography, a few prolific authors occur in many entries: the
+    author with rank k is chosen with a probability proportional to 1 / k
+    '''
+    authors = []
+    for i in range(count):
+        # the initials keep the names distinct
+        initials = []
+        n = i // (len(LAST_NAMES) * len(FIRST_NAMES))
+        while n:
+            n, digit = divmod(n, 26)
+            initials.append(chr(ord('A') + digit) + '.')
+
+        authors.append(' '.join([
+            LAST_NAMES[i % len(LAST_NAMES)] + ',',
+            FIRST_NAMES[i // len(LAST_NAMES) % len(FIRST_NAMES)]
+        ] + initials))
+
+    weights = []
+    total = 0
+    for k in range(1, count + 1):
+        total += 1.0 / k
+        weights.append(total)
+
+    return lambda: authors[bisect(weights, r.random() * total)]
+
+
+def make_bibtex(entries, seed=0):
+    '''
+    returns the code of a synthetic bibliography with the given number of
+    entries
+    '''
+    r = random.Random(seed)
+    author = make_authors(max(100, entries // 4), r)
+
+    def words(count):
+        return ' '.join(r.choice(WORDS) for _ in range(count))
+
+    code = ['@string{pami = "{IEEE} Transactions on Pattern Analysis"}\n']
+    for i in range(entries):
+        code.append(
+            '@{0}{{key{1},\n'
+            '  author = {{{2}}},\n'
+            '  title = "{3}",\n'
+            '  journal = {4},\n'
+            '  year = {5},\n'
+            '  month = jan,\n'
+            '  abstract = {{{6}}},\n'
+            '}}\n\n'.format(
+                r.choice(['article', 'book', 'inproceedings']),
+                i,
+                ' and '.join(author() for _ in range(r.randint(1, 4))),
+                words(r.randint(3, 10)),
+                'pami' if i % 7 == 0 else '{' + r.choice(JOURNALS) + '}',
+                r.randint(1950, 2020),
+                words(40)
+            )
+        )
+
+    return ''.join(code)
+
+
+def timed(func, *args):
+    '''
+    returns the result of func(*args) and the number of seconds it took
+    '''
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def benchmark_lexer(code):
+    tokens, seconds = timed(Lexer().tokenize, code)
+    print('lexer: {0} tokens in {1:.2f}s ({2:.0f} tokens/s)'.format(
+        len(tokens), seconds, len(tokens) / seconds))
+
+
+def benchmark_parser(code):
+    database, seconds = timed(Parser(Lexer()).parse, code)
+    print('parser: {0} entries in {1:.2f}s'.format(len(database), seconds))
+
+    for name, info in sorted(get_memo_info().items()):
+        print('  {0}: {1} hits, {2} misses ({3:.0%} hit rate)'.format(
+            name, info.hits, info.misses,
+            info.hits / float(max(1, info.hits + info.misses))))
+
+
+def benchmark_split_tex_string(repeat=20000):
+    for string, sep in [
+        ('Smith, John A.', r',[\s~]*'),
+        ('Smith, John and van Dijk, Ahmed and Okafor, John', None),
+        ('M{\\"u}ller, Fran{\\c{c}}ois', r',[\s~]*'),
+        ('M{\\"u}ller, J{\\"o}rg and {IEEE} Working Group', None)
+    ]:
+        _, seconds = timed(
+            lambda: [split_tex_string(string, sep=sep) for _ in range(repeat)]
+        )
+        print('split_tex_string({0!r}): {1:.2f}us per call'.format(
+            string, seconds / repeat * 1e6))
+
+
+def benchmark_remove_latex_commands(repeat=20000):
+    for string in [
+        'Analysis of Deep Learning Methods for Stable Quantum Networks in '
+        'Graph Theory',
+        '{Analysis of Deep Learning Methods for {IEEE} Systems with '
+        '$\\alpha$ Beta Stable Quantum Networks}',
+        'An \\emph{Analysis} of {Deep} \\textbf{Learning} Methods for '
+        '{IEEE} Systems with \\LaTeX and \\TeX Graph Theory'
+    ]:
+        for name, func in [
+            ('by char', remove_latex_commands_by_char),
+            ('by pattern', remove_latex_commands)
+        ]:
+            _, seconds = timed(
+                lambda: [func(string) for _ in range(repeat)])
+            print('remove_latex_commands {0} ({1} chars): {2:.2f}us per '
+                  'call'.format(name, len(string), seconds / repeat * 1e6))
+
+
+def benchmark_latex_decode(code):
+    latex_chars.register()
+    values = [
+        value
+        for entry in Parser(Lexer()).parse(code).values()
+        for value in entry.values()
+    ]
+
+    _, seconds = timed(
+        lambda: [codecs.decode(value, 'latex') for value in values])
+    print('latex decoding: {0} values in {1:.2f}s ({2:.1f}us per value)'.format(
+        len(values), seconds, seconds / len(values) * 1e6))
+
+    info = latex_chars.get_memo_info()
+    if info is not None:
+        print('  latex_decode: {0} hits, {1} misses ({2:.0%} hit rate)'.format(
+            info.hits, info.misses,
+            info.hits / float(max(1, info.hits + info.misses))))
+
+
+class DictEntry(object):
+    '''
+    an entry as it was stored before Entry had slots and kept its fields in
+    a SharedKeyDict
+    '''
+
+    def __init__(self, entry):
+        self.entry_type = entry.entry_type
+        self.cite_key = entry.cite_key
+        self.database = None
+        self._attributes = CaseInsensitiveOrderedDict(entry._attributes)
+
+
+def measured(func, *args):
+    '''
+    returns the result of func(*args) and the number of bytes it allocated
+    which are still in use
+    '''
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_memory(code):
+    if tracemalloc is None:
+        print('memory: tracemalloc is not available')
+        return
+
+    entries = list(Parser(Lexer()).parse(code).values())
+
+    # the field values are shared, so only the entries themselves count
+    for name, make_entry in [
+        ('dict entries', DictEntry),
+        ('slotted entries', lambda entry: Entry(
+            entry.entry_type, entry.cite_key, entry._attributes))
+    ]:
+        _, size = measured(lambda: [make_entry(entry) for entry in entries])
+        print('{0}: {1:.1f} MB ({2:.0f} bytes per entry)'.format(
+            name, size / 1e6, size / float(len(entries))))
+
+    try:
+        from ....latextools_utils.bibcache import FormattedEntry
+    except ImportError:
+        # this needs the sublime module
+        return
+
+    for name, make_entry in [
+        ('frozendict formatted entries', lambda entry: frozendict(**{
+            'keyword': entry.cite_key,
+            '<prefix_match>': entry.cite_key,
+            '<panel_formatted>': (entry.cite_key,),
+            '<autocomplete_formatted>': entry.cite_key
+        })),
+        ('slotted formatted entries', lambda entry: FormattedEntry(
+            entry.cite_key, entry.cite_key, (entry.cite_key,),
+            entry.cite_key))
+    ]:
+        _, size = measured(lambda: [make_entry(entry) for entry in entries])
+        print('{0}: {1:.1f} MB ({2:.0f} bytes per entry)'.format(
+            name, size / 1e6, size / float(len(entries))))
+
+
+def main(argv):
+    entries = int(argv[0]) if argv else 100000
+    code = make_bibtex(entries)
+    print('{0} entries, {1:.1f} MB'.format(entries, len(code) / 1e6))
+
+    benchmark_split_tex_string()
+    benchmark_remove_latex_commands()
+    benchmark_lexer(code)
+    benchmark_parser(code)
+    benchmark_latex_decode(code)
+    benchmark_memory(code)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
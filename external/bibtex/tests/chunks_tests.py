@@ -0,0 +1,193 @@
+from ..chunks import parse_chunks, split_chunks
+from ..parser import Parser
+
+import unittest
+
+BIBTEX = '''junk before the first entry
+@comment{this is ignored}
+@string{ jan = "January" }
+@string{ pub = "Some Publisher" }
+@preamble{ "\\newcommand{\\noop}[1]{}" }
+@article{ key1,
+    title = "A {"}quoted{"} title",
+    month = jan,
+    publisher = pub # " Inc."
+}
+@book{ key2,
+    title = {A title with @ and {nested} brackets},
+    year = 2000
+}
+'''
+
+
+class TestSplitChunks(unittest.TestCase):
+
+    def test_split_chunks(self):
+        self.assertEqual(
+            split_chunks(BIBTEX),
+            [
+                '@comment{this is ignored}\n',
+                '@string{ jan = "January" }\n',
+                '@string{ pub = "Some Publisher" }\n',
+                '@preamble{ "\\newcommand{\\noop}[1]{}" }\n',
+                '@article{ key1,\n'
+                '    title = "A {"}quoted{"} title",\n'
+                '    month = jan,\n'
+                '    publisher = pub # " Inc."\n'
+                '}\n',
+                '@book{ key2,\n'
+                '    title = {A title with @ and {nested} brackets},\n'
+                '    year = 2000\n'
+                '}\n'
+            ]
+        )
+
+    def test_split_chunks_without_entries(self):
+        self.assertEqual(split_chunks('no entries here'), [])
+
+    def test_comment_ends_at_end_of_line(self):
+        self.assertEqual(
+            split_chunks('@comment{ @article{key,\n}'),
+            ['@comment{ @article{key,\n}']
+        )
+
+        self.assertEqual(
+            split_chunks('@comment{\n@article{key,\n}'),
+            ['@comment{\n', '@article{key,\n}']
+        )
+
+
+class TestParseChunks(unittest.TestCase):
+
+    def assertSameDatabase(self, database, expected):
+        self.assertEqual(list(database), list(expected))
+        self.assertEqual(database.get_preamble(), expected.get_preamble())
+        for key in expected:
+            self.assertEqual(
+                dict(database[key].items()),
+                dict(expected[key].items())
+            )
+            self.assertIs(database[key].database, database)
+
+    def test_parse_chunks_same_as_parse(self):
+        database, _ = parse_chunks(BIBTEX)
+
+        self.assertSameDatabase(database, Parser().parse(BIBTEX))
+        self.assertEqual(database['key1']['publisher'], 'Some Publisher Inc.')
+
+    def test_parse_chunks_without_processes(self):
+        from .. import chunks
+
+        class FailingContext(object):
+
+            def Pool(self, processes):
+                raise OSError('cannot start processes')
+
+        get_fork_context = chunks._get_fork_context
+        min_chunks = chunks.PARALLEL_MIN_CHUNKS
+        chunks.PARALLEL_MIN_CHUNKS = 1
+        try:
+            for context in (None, FailingContext()):
+                chunks._get_fork_context = lambda: context
+                database, _ = parse_chunks(BIBTEX, processes=2)
+                self.assertSameDatabase(database, Parser().parse(BIBTEX))
+        finally:
+            chunks._get_fork_context = get_fork_context
+            chunks.PARALLEL_MIN_CHUNKS = min_chunks
+
+    def assertSameError(self, code, processes=1):
+        with self.assertRaises(SyntaxError) as expected:
+            Parser().parse(code)
+
+        with self.assertRaises(SyntaxError) as error:
+            parse_chunks(code, processes=processes)
+
+        self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_errors_report_positions_in_file(self):
+        self.assertSameError(BIBTEX + '@misc{ key3,\n    title {a}\n}\n')
+        self.assertSameError(BIBTEX + '@misc{ key3, title = "a" } @misc{ , }')
+        self.assertSameError(BIBTEX + '@string{ x = }\n')
+        self.assertSameError(BIBTEX + '@misc{ key3, title = "a" \n ! }')
+
+    def test_errors_report_positions_in_file_in_processes(self):
+        from .. import chunks
+
+        min_chunks = chunks.PARALLEL_MIN_CHUNKS
+        chunks.PARALLEL_MIN_CHUNKS = 1
+        try:
+            self.assertSameError(
+                BIBTEX + '@misc{ key3,\n    title {a}\n}\n', processes=2
+            )
+        finally:
+            chunks.PARALLEL_MIN_CHUNKS = min_chunks
+
+    def test_unchanged_chunks_are_reused(self):
+        database, chunks = parse_chunks(BIBTEX)
+
+        modified = BIBTEX.replace('year = 2000', 'year = 2001')
+        new_database, new_chunks = parse_chunks(modified, chunks)
+
+        self.assertSameDatabase(new_database, Parser().parse(modified))
+        self.assertIs(new_database['key1'], database['key1'])
+        self.assertIsNot(new_database['key2'], database['key2'])
+        self.assertEqual(len(new_chunks), len(chunks))
+
+    def test_chunks_using_changed_macros_are_parsed_again(self):
+        database, chunks = parse_chunks(BIBTEX)
+
+        modified = BIBTEX.replace('"January"', '"Jan."')
+        new_database, _ = parse_chunks(modified, chunks)
+
+        self.assertSameDatabase(new_database, Parser().parse(modified))
+        self.assertEqual(new_database['key1']['month'], 'Jan.')
+        self.assertIsNot(new_database['key1'], database['key1'])
+        self.assertIs(new_database['key2'], database['key2'])
+
+    def test_chunks_using_removed_macros_are_parsed_again(self):
+        _, chunks = parse_chunks(BIBTEX)
+
+        modified = BIBTEX.replace('@string{ pub = "Some Publisher" }\n', '')
+        new_database, _ = parse_chunks(modified, chunks)
+
+        self.assertSameDatabase(new_database, Parser().parse(modified))
+
+    def test_crossrefs_are_resolved(self):
+        code = (
+            '@inproceedings{key, crossref = {proc}}\n'
+            '@proceedings{proc, booktitle = {Proceedings}}\n'
+        )
+        database, chunks = parse_chunks(code)
+
+        self.assertEqual(database['key']._inherited,
+                         {'booktitle': 'Proceedings'})
+
+        modified = code.replace('{Proceedings}', '{Other Proceedings}')
+        database, _ = parse_chunks(modified, chunks)
+
+        self.assertEqual(database['key']['booktitle'], 'Other Proceedings')
+
+    def test_duplicate_keys_keep_first_entry(self):
+        code = '@misc{key, title={first}}\n@misc{key, title={second}}\n'
+        database, _ = parse_chunks(code)
+
+        self.assertEqual(database['key']['title'], 'first')
+
+    def test_parse_chunks_in_processes(self):
+        from .. import chunks
+
+        code = BIBTEX + ''.join(
+            '@misc{{key{0}, month = {1}}}\n'.format(
+                i, 'jan' if i % 2 else 'pub')
+            for i in range(3, 20)
+        ) + '@string{ jan = "Jan." }\n@misc{key20, month = jan}\n'
+
+        min_chunks = chunks.PARALLEL_MIN_CHUNKS
+        chunks.PARALLEL_MIN_CHUNKS = 1
+        try:
+            database, _ = parse_chunks(code, processes=2)
+        finally:
+            chunks.PARALLEL_MIN_CHUNKS = min_chunks
+
+        self.assertSameDatabase(database, Parser().parse(code))
+        self.assertEqual(database['key20']['month'], 'Jan.')
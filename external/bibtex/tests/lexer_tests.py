@@ -2265,3 +2265,135 @@ class TestTokenize(LexerTest):
                 tokens[-1][0]
             )
         )
+
+    def test_iter_tokens_same_as_tokenize(self):
+        code = '''
+            @string{ jan = "January" }
+            @article{ key,
+                author = {Bloggs, Joe},
+                title = "A {"}quoted{"}
+                    title",
+                month = jan # " 1st"
+            }
+            @comment{ ignored }
+            @book{ other, year = 2000 }
+        '''
+
+        tokens = list(self.lexer.iter_tokens(code))
+
+        self.assertEqual(tokens, Lexer().tokenize(code))
+        self.assertEqual(tokens[-1][0], 'EOF')
+
+
+class TestLocations(LexerTest):
+
+    def test_tokens_record_offsets(self):
+        code = '@article{key,\n  title = {x}\n}'
+        tokens = self.lexer.tokenize(code)
+
+        self.assertEqual(tokens[3][0], 'KEY')
+        self.assertEqual(tokens[3][2], (16, 21))
+        self.assertEqual(code[16:21], 'title')
+
+    def test_get_line_and_column(self):
+        self.lexer.tokenize('@article{key,\n  title = {x}\n}')
+
+        self.assertEqual(self.lexer.get_line_and_column(0), (0, 0))
+        self.assertEqual(self.lexer.get_line_and_column(13), (0, 13))
+        self.assertEqual(self.lexer.get_line_and_column(14), (1, 0))
+        self.assertEqual(self.lexer.get_line_and_column(16), (1, 2))
+        self.assertEqual(self.lexer.get_line_and_column(28), (2, 0))
+
+    def test_token_error_reports_line_and_column(self):
+        with self.assertRaises(SyntaxError) as context:
+            self.lexer.tokenize('@article{key,\n  title = {x}\n  ti tle }')
+
+        self.assertTrue(str(context.exception).startswith('3:3 - '))
+
+
+class TestEntryTokens(LexerTest):
+
+    def test_tokenize_nested_and_multiline_values(self):
+        tokens = self.lexer.tokenize(
+            '@misc{k, a = {x {y {z}} w}, b = "p {q} r", c = {m\n   n},}'
+        )
+
+        self.assertEqual(
+            [(tag, value) for tag, value, _ in tokens],
+            [
+                ('ENTRY_START', '@'),
+                ('ENTRY_TYPE', 'misc'),
+                ('IDENTIFIER', 'k'),
+                ('KEY', 'a'),
+                ('VALUE', 'x {y {z}} w'),
+                ('KEY', 'b'),
+                ('QUOTED_STRING', 'p {q} r'),
+                ('KEY', 'c'),
+                ('VALUE', 'm n'),
+                ('ENTRY_END', '}'),
+                ('EOF', '')
+            ]
+        )
+
+    def test_entry_tokens_stops_at_entry_end(self):
+        self.lexer.code = 'title = {x} } trailing'
+        self.lexer.code_len = len(self.lexer.code)
+        self.lexer.in_entry = True
+
+        result = self.lexer.entry_tokens()
+
+        self.assertEqual(result, 13)
+        self.assertFalse(self.lexer.in_entry)
+        self.assertEqual(
+            [token[0] for token in self.lexer.tokens],
+            ['KEY', 'VALUE', 'ENTRY_END']
+        )
+
+
+class TestSkipFields(unittest.TestCase):
+
+    CODE = '''
+        @string{ abstract = "kept" }
+        @article{ key,
+            title = {Title},
+            Abstract = {Long
+                {nested} text},
+            annote = "quoted {text}" # abstract,
+            year = 2000
+        }
+    '''
+
+    def test_skipped_fields_produce_no_tokens(self):
+        tokens = Lexer(skip_fields=['abstract', 'ANNOTE']).tokenize(self.CODE)
+
+        self.assertEqual(
+            [(tag, value) for tag, value, _ in tokens],
+            [
+                ('STRING', 'string'),
+                ('KEY', 'abstract'),
+                ('QUOTED_STRING', 'kept'),
+                ('ENTRY_END', '}'),
+                ('ENTRY_START', '@'),
+                ('ENTRY_TYPE', 'article'),
+                ('IDENTIFIER', 'key'),
+                ('KEY', 'title'),
+                ('VALUE', 'Title'),
+                ('KEY', 'year'),
+                ('IDENTIFIER', '2000'),
+                ('ENTRY_END', '}'),
+                ('EOF', '')
+            ]
+        )
+
+    def test_skipped_fields_consume_the_same_code(self):
+        tokens = Lexer().tokenize(self.CODE)
+        skipped_tokens = Lexer(skip_fields=['abstract', 'annote']).tokenize(
+            self.CODE)
+
+        self.assertEqual(
+            skipped_tokens,
+            [
+                token for i, token in enumerate(tokens)
+                if not 9 <= i < 15
+            ]
+        )
@@ -364,3 +364,73 @@ class TestEntry(unittest.TestCase):
             self.entry.__getitem__,
             'title'
         )
+
+
+class TestResolveInheritance(unittest.TestCase):
+
+    def setUp(self):
+        self.database = Database()
+
+    def add_entry(self, key, **fields):
+        entry = Entry('book', key)
+        for field, value in fields.items():
+            entry._attributes[field] = value
+        self.database.add_entry(entry)
+        return entry
+
+    def test_crossref_fields_are_inherited(self):
+        self.add_entry('key1', title='Moby Dick', crossref='key2')
+        self.add_entry('key2', publisher='Harper')
+        entry = self.add_entry('key', crossref='key1', title='Typee')
+
+        self.database.resolve_inheritance()
+
+        self.assertEqual(entry['title'], 'Typee')
+        self.assertEqual(entry['PUBLISHER'], 'Harper')
+        self.assertEqual(entry['crossref'], 'key1')
+        self.assertEqual(entry._inherited, {'publisher': 'Harper'})
+
+    def test_xdata_fields_are_inherited(self):
+        self.add_entry('data1', publisher='Harper', location='New York')
+        self.add_entry('data2', publisher='Other', year='1851')
+        self.add_entry('key1', publisher='Crossref', edition='2')
+        entry = self.add_entry(
+            'key', xdata='data1, data2', crossref='key1', location='London')
+
+        self.database.resolve_inheritance()
+
+        self.assertEqual(entry['location'], 'London')
+        self.assertEqual(entry['publisher'], 'Harper')
+        self.assertEqual(entry['year'], '1851')
+        self.assertEqual(entry['edition'], '2')
+
+    def test_missing_fields_raise_keyerror(self):
+        self.add_entry('key1')
+        entry = self.add_entry('key', crossref='key1')
+        other = self.add_entry('other', crossref='missing')
+
+        self.database.resolve_inheritance()
+
+        self.assertRaises(KeyError, entry.__getitem__, 'title')
+        self.assertRaises(KeyError, other.__getitem__, 'title')
+        self.assertNotIn('title', entry)
+
+    def test_cycles_are_ignored(self):
+        entry1 = self.add_entry('key1', crossref='key2', title='Moby Dick')
+        entry2 = self.add_entry('key2', crossref='key1', year='1851')
+
+        self.database.resolve_inheritance()
+
+        self.assertEqual(entry1['year'], '1851')
+        self.assertEqual(entry2['year'], '1851')
+        self.assertEqual(entry1['crossref'], 'key2')
+
+    def test_resolving_again_uses_changed_fields(self):
+        parent = self.add_entry('key1', title='Moby Dick')
+        entry = self.add_entry('key', crossref='key1')
+        self.database.resolve_inheritance()
+
+        parent['title'] = 'Typee'
+        self.database.resolve_inheritance()
+
+        self.assertEqual(entry['title'], 'Typee')
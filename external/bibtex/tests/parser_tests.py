@@ -1,6 +1,6 @@
 from ..ast import *
 from ..model import *
-from ..parser import Parser
+from ..parser import MAX_INTERNED_LENGTH, Parser
 
 import unittest
 
@@ -1026,3 +1026,90 @@ class TestParse(unittest.TestCase):
             parser.parse,
             None
         )
+
+    def test_parse_discards_tokens_of_parsed_items(self):
+        buffered = []
+
+        class StreamingLexer(self.DummyLexer):
+            def iter_tokens(self, _):
+                for token in self.tokens:
+                    buffered.append(len(parser.tokens))
+                    yield token
+
+        tokens = []
+        for i in range(10):
+            tokens.extend([
+                ('ENTRY_START', '@', {}),
+                ('ENTRY_TYPE', 'article', {}),
+                ('IDENTIFIER', 'key{0}'.format(i), {}),
+                ('KEY', 'title', {}),
+                ('VALUE', 'title', {}),
+                ('ENTRY_END', '}', {})
+            ])
+        tokens.append(('EOF', '', {}))
+
+        parser = Parser(StreamingLexer(tokens))
+        result = parser.parse(None)
+
+        self.assertEqual(len(result), 10)
+        self.assertEqual(result['key9']['title'], 'title')
+        # only the tokens of a single entry are ever kept
+        self.assertLessEqual(max(buffered), 6)
+
+    def test_parse_error_reports_line_and_column(self):
+        parser = Parser()
+
+        with self.assertRaises(SyntaxError) as context:
+            parser.parse('@string{\n  {x}}')
+
+        self.assertEqual(
+            str(context.exception),
+            '2:3 - unexpected value; expecting key'
+        )
+
+    def test_parse_visits_each_token_once(self):
+        tokens = [
+            ('ENTRY_START', '@', {}),
+            ('ENTRY_TYPE', 'article', {}),
+            ('IDENTIFIER', 'key', {}),
+            ('KEY', 'title', {}),
+            ('VALUE', 'title', {}),
+            ('KEY', 'journal', {}),
+            ('IDENTIFIER', 'jnl', {}),
+            ('#', '#', {}),
+            ('QUOTED_STRING', ' Letters', {}),
+            ('KEY', 'year', {}),
+            ('NUMBER', '2000', {}),
+            ('ENTRY_END', '}', {}),
+            ('EOF', '', {})
+        ]
+        parser = Parser(self.DummyLexer(tokens))
+
+        visits = []
+        advance = parser._advance
+
+        def counting_advance():
+            advance()
+            visits.append(parser.token_type)
+
+        parser._advance = counting_advance
+
+        result = parser.parse(None)
+
+        self.assertEqual(visits, [token[0] for token in tokens])
+        self.assertEqual(result['key']['journal'], 'jnl Letters')
+        self.assertEqual(result['key']['year'], '2000')
+
+    def test_parse_interns_repeated_values(self):
+        code = ''.join(
+            '@article{{key{0}, journal = {{Nature}}, year = "2000",'
+            ' author = {{Smith, John}}, title = {{{1}}}}}\n'.format(
+                i, 'x' * (MAX_INTERNED_LENGTH + 1))
+            for i in range(2)
+        )
+        result = Parser().parse(code)
+
+        for field in ('journal', 'year', 'author'):
+            self.assertIs(result['key0'][field], result['key1'][field])
+        self.assertIsNot(result['key0']['title'], result['key1']['title'])
+        self.assertEqual(result['key0']['title'], result['key1']['title'])
@@ -1,8 +1,34 @@
-from ..tex import tokenize_list
+from ..tex import remove_latex_commands, tokenize_list
 
+import random
 import unittest
 
 
+def remove_latex_commands_by_char(s):
+    '''
+    the implementation remove_latex_commands() replaced, which looks at one
+    character at a time
+    '''
+    chars = []
+    FOUND_SLASH = False
+
+    for c in s:
+        if c == '{':
+            # i.e., we are entering the contents of the command
+            if FOUND_SLASH:
+                FOUND_SLASH = False
+        elif c == '}':
+            pass
+        elif c == '\\':
+            FOUND_SLASH = True
+        elif not FOUND_SLASH:
+            chars.append(c)
+        elif c.isspace():
+            FOUND_SLASH = False
+
+    return ''.join(chars)
+
+
 class TestTokenizeList(unittest.TestCase):
     def test_simple(self):
         self.assertEqual(
@@ -51,3 +77,51 @@ class TestTokenizeList(unittest.TestCase):
             tokenize_list(u'Chemicals and and Entrails'),
             [u'Chemicals', u'Entrails']
         )
+
+    def test_memoized_result_is_not_shared(self):
+        result = tokenize_list(u'Chemicals and Entrails')
+        result.append(u'Other')
+
+        self.assertEqual(
+            tokenize_list(u'Chemicals and Entrails'),
+            [u'Chemicals', u'Entrails']
+        )
+
+
+class TestRemoveLatexCommands(unittest.TestCase):
+    def test_plain_text(self):
+        self.assertEqual(
+            remove_latex_commands(u'Chemicals and Entrails'),
+            u'Chemicals and Entrails'
+        )
+
+    def test_brackets(self):
+        self.assertEqual(
+            remove_latex_commands(u'{IEEE} Transactions on {P}attern'),
+            u'IEEE Transactions on Pattern'
+        )
+
+    def test_commands(self):
+        self.assertEqual(
+            remove_latex_commands(u'\\emph{Chemicals} and \\LaTeX Entrails'),
+            u'Chemicals and Entrails'
+        )
+
+    def test_command_without_brackets_ends_at_space(self):
+        self.assertEqual(
+            remove_latex_commands(u'a \\foo}\\bar\tb'),
+            u'a b'
+        )
+
+    def test_unclosed_command(self):
+        self.assertEqual(remove_latex_commands(u'Entrails\\'), u'Entrails')
+
+    def test_same_as_by_char(self):
+        r = random.Random(0)
+        chars = u'ab \t\n\x1c\xa0\u2003{}\\~$'
+        for _ in range(20000):
+            s = u''.join(r.choice(chars) for _ in range(r.randint(0, 12)))
+            self.assertEqual(
+                remove_latex_commands(s), remove_latex_commands_by_char(s),
+                repr(s)
+            )
@@ -0,0 +1,84 @@
+from ..utils import SharedKeyDict
+
+import pickle
+import unittest
+
+
+class TestSharedKeyDict(unittest.TestCase):
+
+    def test_keys_are_case_insensitive(self):
+        fields = SharedKeyDict([('Title', 'Moby Dick')])
+
+        self.assertEqual(fields['title'], 'Moby Dick')
+        self.assertEqual(fields['TITLE'], 'Moby Dick')
+        self.assertEqual(fields.get('tItLe'), 'Moby Dick')
+        self.assertIn('TiTlE', fields)
+        self.assertEqual(list(fields), ['title'])
+
+    def test_missing_keys(self):
+        fields = SharedKeyDict(title='Moby Dick')
+
+        self.assertRaises(KeyError, fields.__getitem__, 'author')
+        self.assertIsNone(fields.get('author'))
+        self.assertNotIn('author', fields)
+
+    def test_keys_keep_their_order(self):
+        fields = SharedKeyDict()
+        fields['year'] = '1851'
+        fields['title'] = 'Moby Dick'
+        fields['author'] = 'Melville, Herman'
+        fields['YEAR'] = '1852'
+
+        self.assertEqual(
+            list(fields.items()),
+            [
+                ('year', '1852'),
+                ('title', 'Moby Dick'),
+                ('author', 'Melville, Herman')
+            ]
+        )
+
+    def test_delete(self):
+        fields = SharedKeyDict([('year', '1851'), ('title', 'Moby Dick')])
+        del fields['YEAR']
+
+        self.assertEqual(list(fields.items()), [('title', 'Moby Dick')])
+        self.assertEqual(len(fields), 1)
+        self.assertRaises(KeyError, fields.__delitem__, 'year')
+
+    def test_layouts_are_shared(self):
+        fields1 = SharedKeyDict([('year', '1851'), ('title', 'Moby Dick')])
+        fields2 = SharedKeyDict([('YEAR', '1846'), ('TITLE', 'Typee')])
+
+        self.assertIs(fields1._layout, fields2._layout)
+
+    def test_layouts_are_bounded(self):
+        from .. import utils
+
+        max_layouts = utils.MAX_LAYOUTS
+        utils.MAX_LAYOUTS = 10
+        try:
+            all_fields = [
+                SharedKeyDict([('key{0}'.format(i), i), ('title', 'Typee')])
+                for i in range(20)
+            ]
+            self.assertLessEqual(len(utils._LAYOUTS), 10)
+
+            for i, fields in enumerate(all_fields):
+                self.assertEqual(
+                    list(fields.items()),
+                    [('key{0}'.format(i), i), ('title', 'Typee')]
+                )
+
+            fields1 = SharedKeyDict([('year', '1851'), ('title', 'Moby Dick')])
+            fields2 = SharedKeyDict([('YEAR', '1846'), ('TITLE', 'Typee')])
+            self.assertIs(fields1._layout, fields2._layout)
+        finally:
+            utils.MAX_LAYOUTS = max_layouts
+
+    def test_pickle(self):
+        fields = SharedKeyDict([('year', '1851'), ('title', 'Moby Dick')])
+        result = pickle.loads(pickle.dumps(fields, protocol=-1))
+
+        self.assertEqual(dict(result), dict(fields))
+        self.assertIs(result._layout, fields._layout)
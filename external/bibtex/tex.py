@@ -1,5 +1,26 @@
 import re
 
+try:
+    from functools import lru_cache
+except ImportError:
+    # nothing is memoized without lru_cache
+    def lru_cache(maxsize=128):
+        return lambda func: func
+
+# the number of results kept by the memoized functions; the same names and
+# lists of names occur over and over in a bibliography, both while parsing it
+# and while formatting its entries
+MEMO_SIZE = 8192
+
+# any space char or ~
+DEFAULT_SEP = r'(?u)[\s~]+'
+
+_GLOBAL_FLAGS = re.compile(r'(?:\(\?[aiLmsux]+\))+')
+
+# a command, i.e., a backslash followed by anything up to the next opening
+# bracket or space char, including that space char
+_LATEX_COMMAND = re.compile(r'(?u)\\[^{\s]*\s?')
+
 
 def split_tex_string(string, maxsplit=-1, sep=None):
     '''
@@ -11,39 +32,51 @@ def split_tex_string(string, maxsplit=-1, sep=None):
 
     if sep is None:
         # tilde == non-breaking space
-        sep = r'(?u)[\s~]+'
+        sep = DEFAULT_SEP
+
+    sep_re, next_break = _compile_sep(sep)
 
     result = []
 
-    # track ignore separators in braces
-    brace_level = 0
     # calculate once
     string_len = len(string)
     word_start = 0
     splits = 0
 
-    i = 0
-    next_break = re.compile(r'\{|}|(?P<sep>' + sep + ')')
-
-    while i < string_len:
-        match = next_break.search(string, i)
-        if match:
-            matched = match.group(0)
-            if matched == '{':
-                brace_level += 1
-            elif matched == '}':
-                brace_level -= 1
-            elif brace_level == 0 and match.start('sep') > 0:
-                if match.end('sep') <= string_len:
+    if '{' not in string and '}' not in string:
+        # without brackets, every separator counts
+        for match in sep_re.finditer(string):
+            sep_start = match.start()
+            if sep_start > 0:
+                result.append(string[word_start:sep_start])
+                word_start = match.end()
+
+                splits += 1
+                if splits == maxsplit:
+                    break
+    else:
+        # track ignore separators in braces
+        brace_level = 0
+
+        i = 0
+        while i < string_len:
+            match = next_break.search(string, i)
+            if match:
+                matched = match.group(0)
+                if matched == '{':
+                    brace_level += 1
+                elif matched == '}':
+                    brace_level -= 1
+                elif brace_level == 0 and match.start('sep') > 0:
                     result.append(string[word_start:match.start('sep')])
                     word_start = match.end('sep')
 
                     splits += 1
                     if splits == maxsplit:
                         break
-            i = match.end()
-        else:
-            i = string_len
+                i = match.end()
+            else:
+                i = string_len
 
     if word_start < string_len:
         result.append(string[word_start:])
@@ -51,5 +84,52 @@ def split_tex_string(string, maxsplit=-1, sep=None):
     return [part.strip() for part in result if part]
 
 
+@lru_cache(maxsize=64)
+def _compile_sep(sep):
+    '''
+    returns the compiled separator and the pattern which finds the next
+    bracket or separator
+
+    global flags, such as (?iu), have to be at the start of a pattern, so any
+    at the start of the separator are moved to the start of the combined
+    pattern, where they have the same effect
+    '''
+    flags = _GLOBAL_FLAGS.match(sep)
+    if flags:
+        flags = flags.group(0)
+        sep = sep[len(flags):]
+    else:
+        flags = ''
+
+    return (
+        re.compile(flags + sep),
+        re.compile(flags + r'\{|}|(?P<sep>' + sep + ')')
+    )
+
+
 def tokenize_list(list_str, _and='and'):
-    return split_tex_string(list_str, sep=r'(?iu)(?:|([\s~])+)' + _and + r'(?:[\s~]+|$)')
+    # a copy, so that the memoized result cannot be modified
+    return list(_tokenize_list(list_str, _and))
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _tokenize_list(list_str, _and):
+    return tuple(split_tex_string(list_str, sep=r'(?iu)(?:|([\s~])+)' + _and + r'(?:[\s~]+|$)'))
+
+
+def remove_latex_commands(string):
+    '''
+    removes any LaTeX commands and brackets from the string, keeping the
+    contents of the brackets, e.g., "\\emph{Some} {IEEE} text" becomes
+    "Some IEEE text"
+
+    a command runs from the backslash up to the next opening bracket or space
+    char; a space char ending a command is removed as well
+    '''
+    if '\\' in string:
+        # the commands first, as a closing bracket does not end one
+        string = _LATEX_COMMAND.sub('', string)
+
+    if '{' not in string and '}' not in string:
+        return string
+    return string.replace('{', '').replace('}', '')
@@ -1,3 +1,5 @@
+from collections import MutableMapping
+
 try:
     from collections import OrderedDict
 except (ImportError, NameError):
@@ -302,3 +304,157 @@ class CaseInsensitiveOrderedDict(OrderedDict):
             return super(CaseInsensitiveOrderedDict, self).pop(key)
         else:
             return super(CaseInsensitiveOrderedDict, self).pop(key, default)
+
+
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+
+class _Layout(object):
+    '''
+    the keys of a SharedKeyDict, in order, along with their positions; all
+    SharedKeyDicts with the same keys share the same layout
+    '''
+
+    __slots__ = ('keys', 'positions', '_children')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.positions = dict((key, i) for i, key in enumerate(keys))
+        self._children = {}
+
+    def add(self, key):
+        '''
+        returns the layout with key added at the end
+        '''
+        try:
+            return self._children[key]
+        except KeyError:
+            layout = self._children[key] = get_layout(self.keys + (key,))
+            return layout
+
+    def remove(self, key):
+        '''
+        returns the layout without key
+        '''
+        return get_layout(tuple(k for k in self.keys if k != key))
+
+
+# the most layouts which are kept for sharing; as each layout refers to the
+# layouts with one more key, the shared layouts would otherwise keep every
+# combination of keys ever used alive
+MAX_LAYOUTS = 4096
+
+_LAYOUTS = {}
+
+
+def get_layout(keys):
+    '''
+    returns the shared _Layout for the tuple of lower case keys
+    '''
+    try:
+        return _LAYOUTS[keys]
+    except KeyError:
+        if len(_LAYOUTS) >= MAX_LAYOUTS:
+            _clear_layouts()
+
+        keys = tuple(intern(key) for key in keys)
+        return _LAYOUTS.setdefault(keys, _Layout(keys))
+
+
+def _clear_layouts():
+    '''
+    stops sharing the layouts, which are then only kept alive by the
+    SharedKeyDicts still using them; the empty layout stays shared, as every
+    SharedKeyDict starts with it
+    '''
+    for layout in list(_LAYOUTS.values()):
+        layout._children.clear()
+
+    _LAYOUTS.clear()
+    try:
+        _LAYOUTS[()] = _EMPTY_LAYOUT
+    except NameError:
+        pass
+
+
+class SharedKeyDict(MutableMapping):
+    '''
+    a compact, ordered and case insensitive mapping for the fields of an
+    entry
+
+    the keys are lower-cased once when they are added and kept in a _Layout
+    shared by all SharedKeyDicts with the same keys, while the values are
+    kept in a list; as most entries of a bibliography have one of a few sets
+    of fields, this takes a fraction of the memory of a dict per entry
+    '''
+
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, *args, **kwargs):
+        self._layout = _EMPTY_LAYOUT
+        self._values = []
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        positions = self._layout.positions
+        try:
+            return self._values[positions[key]]
+        except KeyError:
+            return self._values[positions[key.lower()]]
+
+    def get(self, key, default=None):
+        positions = self._layout.positions
+        i = positions.get(key)
+        if i is None:
+            i = positions.get(key.lower())
+            if i is None:
+                return default
+        return self._values[i]
+
+    def __contains__(self, key):
+        positions = self._layout.positions
+        return key in positions or key.lower() in positions
+
+    def __setitem__(self, key, value):
+        key = key.lower()
+        i = self._layout.positions.get(key)
+        if i is None:
+            self._layout = self._layout.add(key)
+            self._values.append(value)
+        else:
+            self._values[i] = value
+
+    def __delitem__(self, key):
+        key = key.lower()
+        i = self._layout.positions[key]
+        self._layout = self._layout.remove(key)
+        del self._values[i]
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        # the layout is looked up again when unpickling, so that it is
+        # shared with the other SharedKeyDicts
+        return (_make_shared_key_dict, (self._layout.keys, self._values))
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(
+            self.__class__.__name__, list(zip(self._layout.keys, self._values)))
+
+
+_EMPTY_LAYOUT = get_layout(())
+
+
+def _make_shared_key_dict(keys, values):
+    result = SharedKeyDict()
+    result._layout = get_layout(keys)
+    result._values = list(values)
+    return result
@@ -11,6 +11,9 @@ are both available just by letting "import latex_chars" find this file.
 where latin1 can be replaced by any other known encoding, also
 become available by calling latex.register().
 
+Decoded strings are memoized, as the same strings tend to be decoded over
+and over; get_memo_info() reports how often the memo was used.
+
 We also make public a dictionary latex_equivalents,
 mapping ord(unicode char) to LaTeX code.
 
@@ -21,6 +24,16 @@ D. Eppstein, October 2003.
 import codecs
 import re
 
+try:
+    from functools import lru_cache
+except ImportError:
+    # nothing is memoized without lru_cache
+    def lru_cache(maxsize=128):
+        return lambda func: func
+
+# the number of decoded strings kept in the memo
+MEMO_SIZE = 8192
+
 def register():
     """Enable encodings of the form 'latex+x' where x describes another encoding.
     Unicode characters are translated to or from x when possible, otherwise
@@ -28,6 +41,13 @@ def register():
     """
     codecs.register(_registry)
 
+def get_memo_info():
+    """Return the cache_info() of the decoding memo, or None without one."""
+    try:
+        return _memo_decode.cache_info()
+    except AttributeError:
+        return None
+
 def getregentry():
     """Encodings module API."""
     return _registry('latex')
@@ -67,17 +87,9 @@ def _registry(encoding):
             if encoding:
                 input = codecs.decode(input,encoding,errors)
 
-            # Note: we may get buffer objects here.
-            # It is not permussable to call join on buffer objects
-            # but we can make them joinable by calling unicode.
-            # This should always be safe since we are supposed
-            # to be producing unicode output anyway.
-            try:
-                x = map(unicode, _unlatex(input))
-            except NameError:
-                # Python 3
-                x = _unlatex(input)
-            return u''.join(x), len(input)
+            if type(input) is _text_type:
+                return _memo_decode(input), len(input)
+            return _decode(input), len(input)
 
     class StreamWriter(Codec, codecs.StreamWriter):
         pass
@@ -549,3 +561,211 @@ for candidate in _l2u:
     else:
         firstchar = candidate[0]
     _blacklist.discard(firstchar)
+
+
+# Fast decoding.
+#
+# _unlatex splits everything after the first special character into single
+# character tokens and looks at each of them in turn, which makes it slow.
+# _decode gives the same results, but returns values without any special
+# characters unchanged, tokenizes the rest with a single regular expression
+# and only looks up the tokens which can start a translation in _l2u.
+
+try:
+    _text_type = unicode
+    _unichr = unichr
+except NameError:
+    # Python 3
+    _text_type = str
+    _unichr = chr
+
+# every translation contains one of these characters or --, as does any text
+# from which _tokenize drops characters; text without them is returned
+# unchanged
+_translation_start = re.compile(
+    u"[\\x00-\\x08\\x0b\\x0c\\x0e-\\x1f\\x7f\\\\!$?~`']")
+
+# text which _ascii_token may split differently from _tokenize: non-ASCII
+# characters and control characters, which _tokenize drops...
+_irregular_char = re.compile(u"[^\\t\\n\\r\\x20-\\x7e]")
+
+# ...and blanks after a control sequence, which _tokenize skips
+_skipped_blank = re.compile(
+    u"\\\\(?:[a-zA-Z]+|[^a-zA-Z])[ \\t\\n\\r\\x0b\\x0c\\x1c-\\x1f]")
+
+# the tokens _tokenize produces after the first special character of
+# regular text, except that runs of ordinary characters are kept together
+# instead of being split into single characters; as a translation may need
+# to be followed by a closing brace and /~ is a token of its own, the runs
+# end at those as well
+_ascii_token = re.compile(r"""
+    \$\$ | /~ | [0-9]+ | -+ |
+    \\(?:char|accent)[0-9]+ |
+    \\(?:[a-zA-Z]+|[^a-zA-Z]|\Z) |
+    [^\x00-\x1f\x7f!$\-?{}~\\`'/0-9][^\x00-\x1f\x7f!$\-?{}~\\`'/]* |
+    .
+""", re.VERBOSE | re.DOTALL)
+
+# the characters which start a run of ordinary characters
+_ordinary = set(
+    chr(i) for i in range(0x20, 0x7f)
+    if not re.match(r"[!$\-?{}~\\`'/0-9]", chr(i))
+)
+
+# the tokens which may start a translation; any other token is passed
+# through as-is
+_translatable = set(['{', '$', '\\mbox'])
+for _key in _l2u:
+    if isinstance(_key, tuple):
+        _translatable.add(_key[0])
+    else:
+        _translatable.add(_key)
+for _key in list(_translatable):
+    # see the correction of the dotted i in _unlatex.chunk
+    if len(_key) == 1:
+        _translatable.add(_key + 'i')
+_translatable -= _blacklist
+
+# the tokens for which _translate leaves the translation to _unlatex.chunk
+_nested = set(['{', '\\mbox'])
+
+
+def _decode(tex):
+    """Convert latex source string to unicode, like u''.join(_unlatex(tex))."""
+    if type(tex) is not _text_type:
+        # e.g., buffer objects or byte strings in Python 2
+        return u''.join(map(_text_type, _unlatex(tex)))
+
+    match = _stoppers.search(tex)
+    if match is None:
+        # a single token, which is kept as it is
+        return tex
+
+    start = match.start()
+    if (
+        _translation_start.search(tex, start) is None and
+        '--' not in tex
+    ):
+        return tex
+
+    if _irregular_char.search(tex) or _skipped_blank.search(tex, start):
+        return u''.join(_unlatex(tex))
+
+    tokens = _ascii_token.findall(tex, start)
+    if start:
+        tokens.insert(0, tex[:start])
+
+    return u''.join(_translate(tokens))
+
+
+def _translate(tokens):
+    """Return the output of _unlatex for the tokens, as a list."""
+    result = []
+    append = result.append
+    translatable = _translatable
+    nested = _nested
+    candidates = _candidates
+    lookup = _lookup
+    unlatex = None
+
+    last = 'x'
+    pos = 0
+    count = len(tokens)
+    while pos < count:
+        token = tokens[pos]
+        output = None
+        if token in translatable:
+            count = _split_runs(tokens, pos)
+            inner = tokens[pos + 1] if pos + 1 < count else None
+            if token in nested and (token != '{' or inner in nested):
+                if unlatex is None:
+                    unlatex = _unlatex.__new__(_unlatex)
+                    unlatex.tex = tokens
+                unlatex.pos = pos
+                output = unlatex.chunk()
+                pos = unlatex.pos
+            elif token == '{':
+                # {\"u}, {\ss}, {$\mu$} and the like
+                if inner in translatable:
+                    for delta, candidate in candidates(
+                            tokens, pos + 1, count):
+                        end = pos + delta + 1
+                        if end < count and tokens[end] == '}':
+                            output = lookup(candidate)
+                            if output is not None:
+                                pos = end + 1
+                                break
+            else:
+                # \"u, \"{u}, \ss, $\mu$ and the like
+                for delta, candidate in candidates(tokens, pos, count):
+                    output = lookup(candidate)
+                    if output is not None:
+                        pos += delta
+                        break
+
+        if output is None:
+            output = token
+            pos += 1
+
+        if last[0] == '\\' and last[-1].isalpha() and output[0].isalpha():
+            output = ' ' + output
+        last = output
+        append(output)
+
+    return result
+
+
+def _split_runs(tokens, pos):
+    """
+    Split the runs of ordinary characters which a translation starting at
+    pos may use into their first character and the rest, as _tokenize would;
+    return the new number of tokens.
+    """
+    end = pos
+    count = len(tokens)
+    while end < count and (tokens[end] == '{' or tokens[end] == '\\mbox'):
+        end += 1
+
+    # the translations use at most three tokens after the innermost one
+    end += 4
+    i = pos + 1
+    while i < end and i < count:
+        token = tokens[i]
+        if len(token) > 1 and token[0] in _ordinary:
+            tokens[i:i + 1] = [token[0], token[1:]]
+            count += 1
+        i += 1
+
+    return count
+
+
+def _candidates(tokens, pos, count):
+    """
+    Return the candidates _unlatex.candidates generates for a token which is
+    not in _nested.
+    """
+    token = tokens[pos]
+    following = tokens[pos + 1] if pos + 1 < count else None
+    if token == '$' and pos + 2 < count and tokens[pos + 2] == '$':
+        return ((3, (token, following, token)),)
+    elif following == '{' and pos + 3 < count and tokens[pos + 3] == '}':
+        return ((4, (token, tokens[pos + 2])), (1, token))
+    elif following:
+        return ((2, (token, following)), (1, token))
+    return ((1, token),)
+
+
+def _lookup(candidate):
+    """Return the translation of a candidate, like _unlatex.chunk, or None."""
+    code = _l2u.get(candidate)
+    if code is None and len(candidate) == 2 and candidate[1] == 'i':
+        # correct failure to undot i
+        code = _l2u.get((candidate[0], '\\i'))
+
+    if code is None:
+        return None
+    return _unichr(code)
+
+
+# only text is memoized, as buffer objects cannot be used as keys
+_memo_decode = lru_cache(maxsize=MEMO_SIZE)(_decode)
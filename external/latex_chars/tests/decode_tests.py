@@ -0,0 +1,67 @@
+from .. import _decode, _unlatex
+
+import random
+import unittest
+
+
+def decode_by_token(s):
+    '''
+    the way strings were decoded before _decode(), which translates one
+    token at a time
+    '''
+    return u''.join(_unlatex(s))
+
+
+class TestDecode(unittest.TestCase):
+
+    def assertSameAsByToken(self, s):
+        self.assertEqual(_decode(s), decode_by_token(s), repr(s))
+
+    def test_plain_text(self):
+        self.assertEqual(_decode(u'Some Title'), u'Some Title')
+
+    def test_accents(self):
+        for s in (
+            u"\\'e", u"\\'{e}", u"{\\'e}", u"{\\'{e}}", u'\\"o', u'\\"{o}',
+            u'\\c c', u'\\c{c}', u'\\v{s}', u'\\^i', u'\\^{\\i}', u'\\`{}',
+            u"Andr\\'{e} and Erd\\H{o}s", u'na\\"\\i ve', u"\\'"
+        ):
+            self.assertSameAsByToken(s)
+
+    def test_backslash_at_end(self):
+        for s in (u'\\', u'a\\', u'{a}\\', u'\\\\', u'a \\\\', u"\\'\\"):
+            self.assertSameAsByToken(s)
+
+    def test_math(self):
+        for s in (
+            u'$x$', u'$\\alpha$', u'$$x^2$$', u'$a', u'a $\\{b\\}$ c',
+            u'$-$', u'\\$5'
+        ):
+            self.assertSameAsByToken(s)
+
+    def test_ties(self):
+        for s in (u'a~b', u'~', u'\\~n', u'\\~{n}', u'/~', u'a~~b'):
+            self.assertSameAsByToken(s)
+
+    def test_ligatures(self):
+        for s in (
+            u'a--b', u'a---b', u'----', u"``quoted''", u'!`', u'?`', u'ff',
+            u'\\ss{}', u'\\ae', u'\\OE{}', u'\\L', u'{\\o}', u'<<>>'
+        ):
+            self.assertSameAsByToken(s)
+
+    def test_same_as_by_token(self):
+        r = random.Random(0)
+        pieces = [
+            u'\\', u"'", u'"', u'`', u'^', u'~', u'{', u'}', u'$', u'$$',
+            u'-', u'--', u'---', u'a', u'e', u'i', u'o', u'c', u'v', u'ss',
+            u'\\i', u'\\ss', u'\\"', u"\\'", u'ff', u'fi', u'ffl', u' ',
+            u'\n', u'\t', u'\xe9', u'!', u'?', u'!`', u'0', u'12', u'/',
+            u'mbox', u'\\mbox', u'\\emph', u'\\c', u'\\v', u'\\char',
+            u'\\alpha', u'\\L', u'\\o', u'_', u'\\\\', u'\x1c', u'\xa0',
+            u'\\ ', u'\\~'
+        ]
+        for _ in range(20000):
+            self.assertSameAsByToken(u''.join(
+                r.choice(pieces) for _ in range(r.randint(0, 10))
+            ))
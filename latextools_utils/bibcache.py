@@ -1,14 +1,247 @@
+import collections
+import hashlib
+import itertools
 import os
-import time
 import traceback
 
-from . import bibformat, cache
+from . import bibformat, bibindex, cache
 from .settings import get_setting
 from ..external.frozendict import frozendict
-from .six import long
 from .system import make_dirs
 
-_VERSION = 2
+_VERSION = 5
+
+# identifies the version of a bib file the cached entries were derived from;
+# size, mtime_ns and inode are taken from os.stat(), content_hash is either
+# the md5 digest of the contents or None if the bib_cache_content_hash
+# setting is disabled
+Fingerprint = collections.namedtuple(
+    'Fingerprint', ['size', 'mtime_ns', 'inode', 'content_hash'])
+
+# the source of the numbers returned by BibCache.get_generation(), which are
+# unique across all BibCache instances, and the meta data of the formatted
+# entries each number was handed out for, by the name of the bibliography
+# plugin and the bib file; the instances only exist while the entries are
+# looked up, so the numbers are kept here, and they are kept when the module
+# is reloaded, so that no number is handed out twice
+try:
+    _GENERATIONS
+except NameError:
+    _GENERATIONS = itertools.count(1)
+    _generations = {}
+
+# one BibCache for each bibliography plugin and bib file, by their names; the
+# instances of a BibCache share their state, which is removed along with the
+# last instance, so keeping one of them keeps the formatted entries and their
+# prefix index in memory between lookups, within the cache_memory_budget
+_bib_caches = {}
+
+
+class FormattedEntry(collections.Mapping):
+    '''
+    the formatted fields of a bibliography entry, as returned by
+    BibCache.get()
+
+    all formatted entries have the same four keys, so they are stored in
+    slots rather than in a dict per entry
+    '''
+
+    __slots__ = (
+        'keyword', 'prefix_match', 'panel_formatted', 'autocomplete_formatted'
+    )
+
+    _KEYS = collections.OrderedDict([
+        ('keyword', 'keyword'),
+        ('<prefix_match>', 'prefix_match'),
+        ('<panel_formatted>', 'panel_formatted'),
+        ('<autocomplete_formatted>', 'autocomplete_formatted')
+    ])
+
+    def __init__(self, keyword, prefix_match, panel_formatted,
+                 autocomplete_formatted):
+        self.keyword = keyword
+        self.prefix_match = prefix_match
+        self.panel_formatted = panel_formatted
+        self.autocomplete_formatted = autocomplete_formatted
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._KEYS[key])
+        except TypeError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def __reduce__(self):
+        return (FormattedEntry, (
+            self.keyword, self.prefix_match, self.panel_formatted,
+            self.autocomplete_formatted
+        ))
+
+    def __repr__(self):
+        return '<FormattedEntry [{0}]>'.format(self.keyword)
+
+
+# the formats LazyFormattedEntry instances are formatted with, i.e., the panel
+# and autocomplete formats and the functions they are compiled into, as set by
+# the last call to _set_lazy_formats()
+_lazy_formats = (None, None, (), None)
+
+
+def _set_lazy_formats(panel_format, autocomplete_format):
+    global _lazy_formats
+    if _lazy_formats[:2] != (panel_format, autocomplete_format):
+        _lazy_formats = (
+            panel_format,
+            autocomplete_format,
+            tuple(bibformat.compile_format(s) for s in panel_format),
+            bibformat.compile_format(autocomplete_format)
+        )
+
+
+class LazyFormattedEntry(collections.Mapping):
+    '''
+    the formatted fields of a bibliography entry, as returned by
+    BibCache.get() if the bib_lazy_formatting setting is enabled
+
+    unlike a FormattedEntry, the panel and autocomplete strings are only
+    formatted when they are first used, e.g., for the entries which are left
+    after filtering by the prefix, and formatted again when they are used
+    after the formats have changed; this keeps the entry itself in memory
+    '''
+
+    __slots__ = (
+        'keyword', 'prefix_match', 'entry', '_panel_formatted',
+        '_autocomplete_formatted'
+    )
+
+    _KEYS = FormattedEntry._KEYS
+
+    def __init__(self, keyword, prefix_match, entry):
+        self.keyword = keyword
+        self.prefix_match = prefix_match
+        self.entry = entry
+        # the formats and the strings formatted with them
+        self._panel_formatted = None
+        self._autocomplete_formatted = None
+
+    @property
+    def panel_formatted(self):
+        formats = _lazy_formats
+        formatted = self._panel_formatted
+        if formatted is None or formatted[0] is not formats:
+            wrapped = bibformat.CompletionWrapper(self.entry)
+            formatted = self._panel_formatted = (
+                formats, tuple(f(wrapped) for f in formats[2]))
+        return formatted[1]
+
+    @property
+    def autocomplete_formatted(self):
+        formats = _lazy_formats
+        formatted = self._autocomplete_formatted
+        if formatted is None or formatted[0] is not formats:
+            wrapped = bibformat.CompletionWrapper(self.entry)
+            formatted = self._autocomplete_formatted = (
+                formats, formats[3](wrapped))
+        return formatted[1]
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._KEYS[key])
+        except TypeError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def __reduce__(self):
+        # the formatted strings are left out, as the formats may have
+        # changed by the time the entry is loaded again
+        return (LazyFormattedEntry, (
+            self.keyword, self.prefix_match, self.entry
+        ))
+
+    def __repr__(self):
+        return '<LazyFormattedEntry [{0}]>'.format(self.keyword)
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def _stat_key(stat):
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def _hash_file(file_name):
+    content_hash = hashlib.md5()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def _create_fingerprint(stat, data=None, file_name=None):
+    if not get_setting('bib_cache_content_hash', True):
+        content_hash = None
+    elif data is not None:
+        content_hash = hashlib.md5(data).hexdigest()
+    else:
+        content_hash = _hash_file(file_name)
+
+    return Fingerprint(*_stat_key(stat), content_hash=content_hash)
+
+
+def read_bib_file(bib_file):
+    '''
+    reads a bib file, returning its contents along with the Fingerprint of
+    the version that was read, which should be passed to BibCache.set()
+    together with the entries parsed from the contents
+
+    raises IOError if the file cannot be read
+
+    :param bib_file:
+        the path of the bib file
+    '''
+    with open(bib_file, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+
+    # 'ignore' to be safe
+    return data.decode('utf-8', 'ignore'), _create_fingerprint(stat, data)
+
+
+def get_generation(bib_plugin_name, bib_files):
+    '''
+    returns a tuple identifying the formatted entries currently cached for
+    each of the bib_files or None if any of them cannot be loaded from the
+    cache
+
+    two equal results mean that the formatted entries have not changed in
+    between
+
+    :param bib_plugin_name:
+        the name the bibliography plugin uses for its BibCache instances
+
+    :param bib_files:
+        the bib files the entries are loaded from
+    '''
+    try:
+        return tuple(
+            (bib_file, BibCache(bib_plugin_name, bib_file).get_generation())
+            for bib_file in bib_files
+        )
+    except cache.CacheMiss:
+        return None
 
 
 class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
@@ -35,44 +268,153 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
             bib_plugin_name, file_hash
         )
 
+        # the prefix index is derived from the formatted entries, so it is
+        # only kept in memory and dropped along with them
+        if not hasattr(self, '_prefix_index'):
+            self._prefix_index = None
+        self._derived_attributes = {
+            self.formatted_cache_name: ('_prefix_index',)
+        }
+
+        _bib_caches.setdefault(self._inst_name, self)
+
     def get(self):
         try:
             result = self._objects[self.formatted_cache_name]
         except KeyError:
+            # not loaded yet or evicted to keep within the memory budget
             try:
                 result = self.load(self.formatted_cache_name)
             except cache.CacheMiss:
                 result = None
+        else:
+            cache._memory_budget.touch(self, self.formatted_cache_name)
 
         try:
             return self.validate_on_get(result)
         except cache.CacheMiss:
             return self._get_bib_cache()[1]
 
-    def set(self, bib_entries):
+    def find(self, lower_prefix):
+        '''
+        returns the formatted entries whose prefix match string contains
+        lower_prefix, in the same order as get()
+
+        the lookup uses a PrefixIndex, which is built the first time the
+        formatted entries are searched
+
+        :param lower_prefix:
+            the lower-cased prefix to search for
+        '''
+        formatted_entries = self.get()
+        if not lower_prefix:
+            return formatted_entries
+
+        index = self._prefix_index
+        if index is None or index.entries is not formatted_entries:
+            index = self._prefix_index = bibindex.PrefixIndex(
+                formatted_entries)
+
+        return index.search(lower_prefix)
+
+    def get_generation(self):
+        '''
+        returns a number identifying the current formatted entries, which
+        changes whenever they are replaced, e.g., because the bib file has
+        been modified
+
+        the number is derived from the meta data of the entries, i.e., the
+        fingerprint of the bib file and the formats, so the entries are only
+        loaded if those have changed
+
+        raises CacheMiss if the entries have not been cached
+        '''
+        try:
+            meta_data, generation = _generations[self._inst_name]
+        except KeyError:
+            pass
+        else:
+            try:
+                fingerprint = self._validate_fingerprint(
+                    meta_data['fingerprint'])
+            except cache.CacheMiss:
+                pass
+            else:
+                if (
+                    fingerprint == meta_data['fingerprint'] and
+                    self._uses_current_formats(meta_data)
+                ):
+                    return generation
+
+        # validating the entries records the generation of their meta data
+        self.get()
+        return _generations[self._inst_name][1]
+
+    def get_chunks(self):
+        '''
+        returns the parsed chunks stored with the entries of the bib file or
+        an empty dict if there are none
+
+        unlike the entries, the chunks are returned even if the bib file has
+        changed since they were stored, as they are used to avoid parsing
+        the unchanged parts of the file again
+        '''
+        try:
+            bib_meta_data, _, chunks = self._read(self.cache_name)
+        except (cache.CacheMiss, TypeError, ValueError):
+            return {}
+
+        if _VERSION != bib_meta_data.get('version') or chunks is None:
+            return {}
+
+        return chunks
+
+    def set(self, bib_entries, fingerprint=None, chunks=None):
+        '''
+        caches the entries of the bib file
+
+        :param bib_entries:
+            the entries parsed from the bib file
+
+        :param fingerprint:
+            the Fingerprint returned by read_bib_file() for the contents the
+            entries were parsed from; if None, the fingerprint of the file as
+            it is now is used
+
+        :param chunks:
+            the parsed chunks the entries were taken from, which are returned
+            by get_chunks() when the bib file has to be parsed again
+        '''
+        if fingerprint is None:
+            fingerprint = _create_fingerprint(
+                os.stat(self.bib_file), file_name=self.bib_file)
+
+        bib_meta_data = frozendict(
+            version=_VERSION,
+            fingerprint=fingerprint
+        )
+
         def _write_bib_cache():
+            bib_cache = (bib_meta_data, bib_entries, chunks)
+            # the entries are only pickled once, for writing them
             try:
-                cache.pickle.dumps(bib_entries, protocol=-1)
+                data = cache.pickle.dumps(bib_cache, protocol=-1)
             except cache.pickle.PicklingError:
                 print('bib_entries must be pickleable')
                 traceback.print_exc()
             else:
                 with self._disk_lock:
                     make_dirs(self.cache_path)
-                    self._write(
-                        self.cache_name,
-                        {self.cache_name: bib_entries}
-                    )
+                    self._write(self.cache_name, bib_cache, data)
 
         # write bib_entries to disk
         self._pool.apply_async(_write_bib_cache)
 
-        formatted_entries = self._create_formatted_entries(bib_entries)
+        formatted_entries = self._create_formatted_entries(
+            bib_entries, fingerprint)
 
-        with self._write_lock:
-            self._objects[self.formatted_cache_name] = formatted_entries
-            self._dirty = True
-        self._schedule_save()
+        self._set_object(self.formatted_cache_name, formatted_entries)
+        self._update_generation(formatted_entries[0])
 
     def cache(self, func):
         try:
@@ -88,21 +430,98 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
 
         meta_data, formatted_entries = obj
 
+        if _VERSION != meta_data.get('version'):
+            raise cache.CacheMiss('outdated cache version')
+
+        fingerprint = self._validate_fingerprint(meta_data['fingerprint'])
+        if fingerprint != meta_data['fingerprint']:
+            # the file has been touched, but its contents are the same
+            meta_data = meta_data.copy(fingerprint=fingerprint)
+            self._set_object(
+                self.formatted_cache_name, (meta_data, formatted_entries))
+
+        if not self._uses_current_formats(meta_data):
+            return self._get_bib_cache()[1]
+
+        self._update_generation(meta_data)
+        return formatted_entries
+
+    def _uses_current_formats(self, meta_data):
+        '''
+        checks whether the formatted entries with meta_data were formatted
+        with the current settings
+        '''
+        if (
+            meta_data.get('lazy_formatting', False) !=
+            get_setting('bib_lazy_formatting', False)
+        ):
+            return False
+
+        # note that the frozendict returns lists stored in the meta data as
+        # tuples, so the settings have to be compared in the same form
+        formats = [
+            _freeze(get_setting("cite_" + s))
+            for s in ["panel_format", "autocomplete_format"]
+        ]
+        if meta_data.get('lazy_formatting', False):
+            # the entries are formatted with the current formats anyway
+            _set_lazy_formats(*formats)
+            return True
+
+        return all(
+            meta_data[s] == f
+            for s, f in zip(["panel_format", "autocomplete_format"], formats)
+        )
+
+    def _update_generation(self, meta_data):
+        '''
+        hands out a new generation if the formatted entries now have
+        different meta data than when the last generation was handed out
+        '''
         try:
-            mtime = os.path.getmtime(self.bib_file)
-        except:
-            raise cache.CacheMiss()
+            old_meta_data, _ = _generations[self._inst_name]
+        except KeyError:
+            pass
         else:
-            if mtime > meta_data['cache_time']:
-                raise cache.CacheMiss('outdated formatted entries')
+            if old_meta_data == meta_data:
+                return
 
-        if _VERSION != meta_data['version'] or any(
-            meta_data[s] != get_setting("cite_" + s)
-            for s in ["panel_format", "autocomplete_format"]
+        _generations[self._inst_name] = (meta_data, next(_GENERATIONS))
+
+    def _validate_fingerprint(self, fingerprint):
+        '''
+        checks that the bib file still matches the fingerprint, returning
+        the up-to-date fingerprint of the file
+
+        if only the timestamp or inode of the file has changed, the contents
+        are compared by hash instead of considering the cache outdated
+
+        raises CacheMiss if the cached entries are outdated
+        '''
+        try:
+            stat = os.stat(self.bib_file)
+        except OSError:
+            raise cache.CacheMiss()
+
+        stat_key = _stat_key(stat)
+        if stat_key == fingerprint[:3]:
+            return fingerprint
+
+        if (
+            fingerprint.content_hash is None or
+            stat.st_size != fingerprint.size
         ):
-            return self._get_bib_cache()[1]
+            raise cache.CacheMiss('outdated bib file fingerprint')
 
-        return formatted_entries
+        try:
+            content_hash = _hash_file(self.bib_file)
+        except (IOError, OSError):
+            raise cache.CacheMiss()
+
+        if content_hash != fingerprint.content_hash:
+            raise cache.CacheMiss('outdated bib file contents')
+
+        return Fingerprint(*stat_key, content_hash=content_hash)
 
     def _get_inst_key(self, *args, **kwargs):
         if not hasattr(self, '_inst_name'):
@@ -115,48 +534,72 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
 
     def _get_bib_cache(self):
         try:
-            cache_mtime = os.path.getmtime(
-                os.path.join(self.cache_path, self.cache_name))
+            bib_meta_data, bib_entries, _ = self._read(self.cache_name)
+        except (TypeError, ValueError):
+            raise cache.CacheMiss('unrecognised bib entry cache')
 
-            bib_mtime = os.path.getmtime(self.bib_file)
-        except:
-            raise cache.CacheMiss()
-        else:
-            if cache_mtime < bib_mtime:
-                raise cache.CacheMiss('outdated bib entry cache')
+        if _VERSION != bib_meta_data.get('version'):
+            raise cache.CacheMiss('outdated cache version')
+
+        fingerprint = self._validate_fingerprint(
+            bib_meta_data['fingerprint'])
 
-        bib_entries = self._read(self.cache_name)
-        formatted_entries = self._create_formatted_entries(bib_entries)
-        with self._write_lock:
-            self._objects[self.formatted_cache_name] = formatted_entries
-            self._dirty = True
-        self._schedule_save()
+        formatted_entries = self._create_formatted_entries(
+            bib_entries, fingerprint)
+        self._set_object(self.formatted_cache_name, formatted_entries)
+        self._update_generation(formatted_entries[0])
 
         return formatted_entries
 
-    def _create_formatted_entries(self, bib_entries):
+    def _create_formatted_entries(self, bib_entries, fingerprint):
         # create the formatted entries
         autocomplete_format = get_setting("cite_autocomplete_format")
         panel_format = get_setting("cite_panel_format")
 
+        lazy_formatting = get_setting('bib_lazy_formatting', False)
+
         meta_data = frozendict(
-            cache_time=long(time.time()),
+            fingerprint=fingerprint,
             version=_VERSION,
             autocomplete_format=autocomplete_format,
-            panel_format=panel_format
+            panel_format=panel_format,
+            lazy_formatting=lazy_formatting
         )
 
-        formatted_entries = tuple(
-            frozendict(**{
-                "keyword": entry["keyword"],
-                "<prefix_match>": bibformat.create_prefix_match_str(entry),
-                "<panel_formatted>": tuple(
-                    bibformat.format_entry(s, entry) for s in panel_format
-                ),
-                "<autocomplete_formatted>":
-                    bibformat.format_entry(autocomplete_format, entry)
-            })
-            for entry in bib_entries
-        )
+        if lazy_formatting:
+            # only the prefix match strings are needed to filter the entries;
+            # the rest is formatted as the entries are shown
+            _set_lazy_formats(_freeze(panel_format), autocomplete_format)
+            return meta_data, tuple(
+                LazyFormattedEntry(
+                    entry["keyword"],
+                    bibformat.create_prefix_match_str(entry),
+                    entry
+                )
+                for entry in bib_entries
+            )
+
+        # the formatted strings which occur more than once, e.g., if the
+        # panel shows the journal or the authors on a line of their own, are
+        # kept only once
+        values = {}
+
+        def _intern(value):
+            return values.setdefault(value, value)
+
+        # the formats are compiled once and each entry is wrapped only once
+        # for all of them
+        format_panel = [bibformat.compile_format(s) for s in panel_format]
+        format_autocomplete = bibformat.compile_format(autocomplete_format)
+
+        formatted_entries = []
+        for entry in bib_entries:
+            wrapped = bibformat.CompletionWrapper(entry)
+            formatted_entries.append(FormattedEntry(
+                entry["keyword"],
+                bibformat.create_prefix_match_str(entry),
+                tuple(_intern(f(wrapped)) for f in format_panel),
+                _intern(format_autocomplete(wrapped))
+            ))
 
-        return meta_data, formatted_entries
+        return meta_data, tuple(formatted_entries)
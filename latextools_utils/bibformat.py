@@ -1,3 +1,4 @@
+from functools import lru_cache
 from string import Formatter
 import collections
 import re
@@ -16,12 +17,62 @@ def _wrap(entry):
 
 
 def format_entry(format_string, entry):
-    return formatter.vformat(format_string, (), _wrap(entry))
+    return compile_format(format_string)(_wrap(entry))
 
 
 def format_entries(format_string, entries):
-    return [formatter.vformat(format_string, (), _wrap(entry))
-            for entry in entries]
+    format_compiled = compile_format(format_string)
+    return [format_compiled(_wrap(entry)) for entry in entries]
+
+
+@lru_cache(maxsize=64)
+def compile_format(format_string):
+    '''
+    returns a function formatting a CompletionWrapper with the format_string
+    the same way as formatter.vformat(format_string, (), entry)
+
+    if the format_string only uses plain field names, such as {author}, the
+    function looks up just those fields and fills them into a %-template of
+    the literal text; otherwise, it calls vformat
+    '''
+    def format_general(entry):
+        return formatter.vformat(format_string, (), entry)
+
+    template = []
+    field_names = []
+    try:
+        for literal, field_name, format_spec, conversion in \
+                formatter.parse(format_string):
+            template.append(literal.replace('%', '%%'))
+            if field_name is None:
+                continue
+
+            if (
+                not field_name or field_name.isdigit() or
+                '.' in field_name or '[' in field_name or
+                format_spec or conversion
+            ):
+                # positional fields, attributes, indices, format specs and
+                # conversions are left to vformat
+                return format_general
+
+            template.append('%s')
+            field_names.append(field_name)
+    except ValueError:
+        # vformat raises the error when the entries are formatted
+        return format_general
+
+    template = ''.join(template)
+    field_names = tuple(field_names)
+
+    if not field_names:
+        template = template.replace('%%', '%')
+        return lambda entry: template
+
+    def format_compiled(entry):
+        return template % tuple([entry[name] for name in field_names])
+
+    return format_compiled
 
 
 def create_prefix_match_str(entry):
@@ -66,6 +117,8 @@ class CompletionWrapper(collections.Mapping):
     Wraps the returned completions so that we can properly handle any
     KeyErrors that occur
     '''
+    __slots__ = ('_entry',)
+
     def __init__(self, entry):
         self._entry = entry
 
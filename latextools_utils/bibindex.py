@@ -0,0 +1,149 @@
+'''
+an index over the prefix match strings of bibliography entries
+
+the cite completions filter entries by testing whether the lower-cased prefix
+typed by the user occurs anywhere in the entry's prefix match string (see
+bibformat.create_prefix_match_str). a PrefixIndex answers the same query
+without testing every entry: the prefix match strings are split into their
+whitespace-separated tokens and the distinct tokens are indexed by their
+trigrams, so that only the tokens which can contain the prefix and the
+entries which contain those tokens are ever visited.
+
+since the prefix can only occur within a single token if it contains no
+whitespace, the result is exactly the same as that of the linear filter; if
+the prefix does contain whitespace, its longest whitespace-free part is used
+to select the candidates, which are then checked against the whole prefix
+'''
+from array import array
+
+from . import bibformat
+
+__all__ = ['PrefixIndex', 'filter_entries', 'get_prefix_match_str']
+
+# length of the n-grams used to select the candidate tokens
+_GRAM_LEN = 3
+
+
+def get_prefix_match_str(entry):
+    try:
+        return entry["<prefix_match>"]
+    except:     # noqa
+        return bibformat.create_prefix_match_str(entry)
+
+
+def filter_entries(entries, lower_prefix):
+    '''
+    the linear filter: returns the entries whose prefix match string contains
+    lower_prefix, in their original order
+    '''
+    return [
+        entry for entry in entries
+        if lower_prefix in get_prefix_match_str(entry)
+    ]
+
+
+class PrefixIndex(object):
+    '''
+    an immutable index over a sequence of entries
+
+    search() returns the same entries, in the same order, as filter_entries()
+    would for the sequence the index was built from
+    '''
+
+    def __init__(self, entries):
+        self.entries = entries = tuple(entries)
+
+        token_ids = {}
+        # the positions of the entries containing each token
+        postings = []
+        for i, entry in enumerate(entries):
+            for token in set(get_prefix_match_str(entry).split()):
+                try:
+                    postings[token_ids[token]].append(i)
+                except KeyError:
+                    token_ids[token] = len(postings)
+                    postings.append(array('i', (i,)))
+
+        grams = {}
+        for token, token_id in token_ids.items():
+            for gram in set(
+                token[j:j + _GRAM_LEN]
+                for j in range(len(token) - _GRAM_LEN + 1)
+            ):
+                try:
+                    grams[gram].append(token_id)
+                except KeyError:
+                    grams[gram] = array('i', (token_id,))
+
+        tokens = [None] * len(token_ids)
+        for token, token_id in token_ids.items():
+            tokens[token_id] = token
+
+        self._tokens = tokens
+        self._postings = postings
+        self._grams = grams
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, lower_prefix):
+        '''
+        returns the entries whose prefix match string contains lower_prefix
+
+        :param lower_prefix:
+            the lower-cased prefix to search for
+        '''
+        parts = lower_prefix.split()
+        if not parts:
+            # the empty string or only whitespace, which occurs in (nearly)
+            # every prefix match string
+            return filter_entries(self.entries, lower_prefix)
+
+        part = max(parts, key=len)
+
+        positions = set()
+        postings = self._postings
+        for token_id in self._find_tokens(part):
+            positions.update(postings[token_id])
+
+        entries = self.entries
+        result = [entries[i] for i in sorted(positions)]
+        if part != lower_prefix:
+            result = filter_entries(result, lower_prefix)
+
+        return result
+
+    def _find_tokens(self, part):
+        tokens = self._tokens
+
+        if len(part) < _GRAM_LEN:
+            return [
+                token_id for token_id, token in enumerate(tokens)
+                if part in token
+            ]
+
+        grams = self._grams
+        candidates = None
+        for gram in sorted(
+            set(part[j:j + _GRAM_LEN]
+                for j in range(len(part) - _GRAM_LEN + 1)),
+            key=lambda gram: len(grams.get(gram, ()))
+        ):
+            try:
+                gram_tokens = grams[gram]
+            except KeyError:
+                return []
+
+            if candidates is None:
+                candidates = set(gram_tokens)
+            else:
+                candidates.intersection_update(gram_tokens)
+
+            if not candidates:
+                return []
+
+        # a token containing all the trigrams need not contain the part
+        return [
+            token_id for token_id in candidates
+            if part in tokens[token_id]
+        ]
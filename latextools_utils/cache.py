@@ -3,7 +3,6 @@ import copy
 import hashlib
 import os
 import re
-import shutil
 import time
 import threading
 import traceback
@@ -20,7 +19,7 @@ from .settings import get_setting
 from ..external.frozendict import frozendict
 from .six import unicode, long, strbase
 from .system import make_dirs
-from .utils import ThreadPool
+from .utils import ThreadPool, estimate_size
 
 
 # the folder, if the local cache is not hidden, i.e. folder in the same
@@ -207,6 +206,238 @@ except NameError:
     _invalid_object = InvalidObject()
 
 
+def _is_invalid(obj):
+    '''
+    checks whether obj marks an invalidated entry; unlike comparing it to
+    _invalid_object, this also works for values which cannot be hashed
+    '''
+    if isinstance(obj, InvalidObject):
+        return True
+
+    try:
+        return obj == _invalid_object
+    except TypeError:
+        return False
+
+
+# the number of threads doing the I/O of all caches
+IO_THREADS = 2
+
+# the number of seconds a cache has to be left unchanged before it is saved
+SAVE_DELAY = 0.5
+
+# the default of the cache_memory_budget setting, in MB
+DEFAULT_MEMORY_BUDGET = 256
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+def _get_io_pool():
+    '''
+    returns the ThreadPool shared by all caches, creating it on first use
+    '''
+    global _io_pool
+    with _io_pool_lock:
+        if _io_pool is None or not _io_pool.is_running():
+            _io_pool = ThreadPool(IO_THREADS)
+        return _io_pool
+
+
+class _SaveScheduler(object):
+    '''
+    saves caches once they have been left unchanged for SAVE_DELAY seconds,
+    so that a burst of changes to a cache is written to disk only once
+
+    a single thread, started on first use, waits for the caches of the whole
+    process; it sleeps until the next cache is due rather than polling
+    '''
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        # the cache and the time it is due to be saved at, by the id of the
+        # state it shares with the other instances of the same cache
+        self._pending = {}
+        self._thread = None
+
+    def schedule(self, cache):
+        '''
+        saves the cache after SAVE_DELAY seconds, unless it is scheduled
+        again before then
+        '''
+        with self._condition:
+            self._pending[id(cache.__dict__)] = (_now() + SAVE_DELAY, cache)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.name = u'LaTeXTools cache saver'
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = _now()
+                    due = [
+                        key for key, (deadline, _) in self._pending.items()
+                        if deadline <= now
+                    ]
+                    if due:
+                        break
+
+                    if self._pending:
+                        self._condition.wait(min(
+                            deadline for deadline, _ in self._pending.values()
+                        ) - now)
+                    else:
+                        self._condition.wait()
+
+                caches = [self._pending.pop(key)[1] for key in due]
+
+            for cache in caches:
+                try:
+                    cache.save_async()
+                except:
+                    traceback.print_exc()
+
+            # the caches are not kept alive while waiting for the next ones
+            del caches, cache
+
+
+class _MemoryBudget(object):
+    '''
+    keeps the values of all caches within the cache_memory_budget setting,
+    in MB, by evicting the least recently used values which have been saved;
+    an evicted value is loaded from disk again the next time it is used
+
+    the size of each value is estimated once, on the I/O pool; the most
+    recently used value is never evicted, as it would be loaded again right
+    away, and a budget of 0 disables the eviction
+
+    a cache can name the attributes derived from the value of a key in its
+    _derived_attributes dict, by key; those are set to None when the value
+    is evicted
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # the state of the cache, the key and the size of each value, by
+        # the id of the state and the key, from least to most recently used
+        self._values = collections.OrderedDict()
+        self._total = 0
+
+    def track(self, cache, key, obj):
+        '''
+        records obj as the most recently used value of key in cache
+        '''
+        try:
+            cache._pool.apply_async(self._add, (cache.__dict__, key, obj))
+        except ValueError:
+            pass
+
+    def touch(self, cache, key):
+        '''
+        marks the value of key in cache as the most recently used one
+        '''
+        with self._lock:
+            try:
+                self._values.move_to_end((id(cache.__dict__), key))
+            except KeyError:
+                pass
+
+    def discard(self, cache, key=None):
+        '''
+        stops tracking the value of key in cache or, if key is None, all
+        values of the cache
+        '''
+        state_id = id(cache.__dict__)
+        with self._lock:
+            for value_id in list(self._values):
+                if value_id[0] == state_id and key in (None, value_id[1]):
+                    self._total -= self._values.pop(value_id)[2]
+
+    def get_usage(self, cache):
+        '''
+        returns a dict of the estimated size of each value of cache which
+        has been tracked so far
+        '''
+        state_id = id(cache.__dict__)
+        with self._lock:
+            return dict(
+                (value_id[1], size)
+                for value_id, (_, _, size) in self._values.items()
+                if value_id[0] == state_id
+            )
+
+    def enforce(self):
+        '''
+        evicts values until the total size is within the budget
+        '''
+        budget = get_setting('cache_memory_budget', DEFAULT_MEMORY_BUDGET)
+        if not budget or budget <= 0:
+            return
+
+        budget *= 1 << 20
+        with self._lock:
+            for value_id in list(self._values)[:-1]:
+                if self._total <= budget:
+                    break
+
+                state, key, size = self._values[value_id]
+                with state['_write_lock']:
+                    # a value which has not been saved cannot be loaded again
+                    if key in state['_dirty_keys']:
+                        continue
+                    state['_objects'].pop(key, None)
+
+                    # anything derived from the value would keep it alive
+                    for name in state.get('_derived_attributes', {}).get(
+                            key, ()):
+                        state[name] = None
+
+                del self._values[value_id]
+                self._total -= size
+
+    def _add(self, state, key, obj):
+        size = estimate_size(obj)
+        value_id = (id(state), key)
+        with self._lock:
+            # the value may have been replaced in the meantime, or the cache
+            # removed, in which case it would only be kept alive by this
+            if (
+                state.get('_released', False) or
+                state['_objects'].get(key) is not obj
+            ):
+                return
+
+            old = self._values.pop(value_id, None)
+            if old is not None:
+                self._total -= old[2]
+            self._values[value_id] = (state, key, size)
+            self._total += size
+
+        self.enforce()
+
+
+# the pool, the scheduler and the budget are kept when the module is
+# reloaded, so that their threads are not started again
+try:
+    _io_pool
+except NameError:
+    _io_pool = None
+    _io_pool_lock = threading.Lock()
+
+try:
+    _save_scheduler
+except NameError:
+    _save_scheduler = _SaveScheduler()
+
+try:
+    _memory_budget
+except NameError:
+    _memory_budget = _MemoryBudget()
+
+
 class Cache(object):
     '''
     default cache object and definition
@@ -227,16 +458,18 @@ class Cache(object):
             self._disk_lock = threading.Lock()
         if not hasattr(self, '_write_lock'):
             self._write_lock = threading.Lock()
-        if not hasattr(self, '_save_lock'):
-            self._save_lock = threading.Lock()
         if not hasattr(self, '_objects'):
             self._objects = {}
-        if not hasattr(self, '_dirty'):
-            self._dirty = False
-        if not hasattr(self, '_save_queue'):
-            self._save_queue = []
+        if not hasattr(self, '_dirty_keys'):
+            # the keys which have changed since they were last saved
+            self._dirty_keys = set()
+        if not hasattr(self, '_pickled'):
+            # the values pickled by set(), with the pickled data, so that
+            # save() does not have to pickle them again
+            self._pickled = {}
         if not hasattr(self, '_pool'):
-            self._pool = ThreadPool(2)
+            # all caches do their I/O on the same pool
+            self._pool = _get_io_pool()
 
         self.cache_path = self._get_cache_path()
 
@@ -257,8 +490,10 @@ class Cache(object):
         except KeyError:
             # note: will raise CacheMiss if can't be found
             result = self.load(key)
+        else:
+            _memory_budget.touch(self, key)
 
-        if result == _invalid_object:
+        if _is_invalid(result):
             raise CacheMiss('{0} is invalid'.format(key))
 
         # return a copy of any objects
@@ -282,7 +517,7 @@ class Cache(object):
 
         return (
             key in self._objects and
-            self._objects[key] != _invalid_object
+            not _is_invalid(self._objects[key])
         )
 
     def set(self, key, obj):
@@ -298,11 +533,6 @@ class Cache(object):
         if key is None:
             raise ValueError('key cannot be None')
 
-        try:
-            pickle.dumps(obj, protocol=-1)
-        except pickle.PicklingError:
-            raise ValueError('obj must be picklable')
-
         if isinstance(obj, list):
             obj = tuple(obj)
         elif isinstance(obj, dict):
@@ -310,10 +540,13 @@ class Cache(object):
         elif isinstance(obj, set):
             obj = frozenset(obj)
 
-        with self._write_lock:
-            self._objects[key] = obj
-            self._dirty = True
-        self._schedule_save()
+        # the data is kept for save(), which writes it as it is
+        try:
+            data = pickle.dumps(obj, protocol=-1)
+        except pickle.PicklingError:
+            raise ValueError('obj must be picklable')
+
+        self._set_object(key, obj, data)
 
     def cache(self, key, func):
         '''
@@ -350,13 +583,15 @@ class Cache(object):
         def _invalidate(key):
             try:
                 self._objects[key] = _invalid_object
+                self._pickled.pop(key, None)
+                self._dirty_keys.add(key)
             except:
                 print('error occurred while invalidating {0}'.format(key))
                 traceback.print_exc()
 
         with self._write_lock:
             if key is None:
-                for k in self._objects.keys():
+                for k in list(self._objects.keys()):
                     _invalidate(k)
             else:
                 if isinstance(key, strbase):
@@ -365,6 +600,16 @@ class Cache(object):
                     for k in key:
                         _invalidate(k)
 
+        # outside the write lock, as the budget takes it while holding its
+        # own lock
+        if key is None:
+            _memory_budget.discard(self)
+        elif isinstance(key, strbase):
+            _memory_budget.discard(self, key)
+        else:
+            for k in key:
+                _memory_budget.discard(self, k)
+
         self._schedule_save()
 
     def _get_cache_path(self):
@@ -389,17 +634,35 @@ class Cache(object):
                         except:
                             print(
                                 u'error while loading {0}'.format(entry_name))
-            else:
-                self._objects[key] = self._read(key)
+                return
+
+        # the file is read without holding the write lock, as save() holds
+        # the disk lock while it waits for the write lock
+        obj = self._read(key)
+        with self._write_lock:
+            # a value which has not been saved yet is newer than the file
+            if key not in self._dirty_keys:
+                self._objects[key] = obj
+            obj = self._objects[key]
+
+        _memory_budget.track(self, key, obj)
+        return obj
 
-        if key is not None:
-            return self._objects[key]
+    def get_memory_usage(self):
+        '''
+        returns a dict of the estimated number of bytes used by the value of
+        each key held in memory
+
+        the sizes are estimated in the background after the values have been
+        set or loaded, so the most recent values may be missing
+        '''
+        return _memory_budget.get_usage(self)
 
     def load_async(self, key=None):
         '''
         an async version of load; does the loading in a new thread
         '''
-        self._pool.apply_async(self.load, key)
+        self._pool.apply_async(self.load, (key,))
 
     def _read(self, key):
         file_path = os.path.join(self.cache_path, key)
@@ -412,104 +675,110 @@ class Cache(object):
 
     def save(self, key=None):
         '''
-        saves the cache entry specified to disk
+        saves the cache entry specified to disk, if it has changed since it
+        was last saved
 
         :param key:
-            the entry to flush to disk; if None, all entries in the cache will
-            be written to disk
+            the entry to flush to disk; if None, all changed entries in the
+            cache will be written to disk
         '''
-        if not self._dirty:
-            return
-
         # lock is aquired here so that all keys being flushed reflect the
         # same state; note that this blocks disk reads, but not cache reads
         with self._disk_lock:
-            # operate on a stable copy of the object
+            # the cached values are never modified, only replaced, so the
+            # values themselves are a stable snapshot of the keys to flush
             with self._write_lock:
-                _objs = pickle.loads(pickle.dumps(self._objects, protocol=-1))
-                self._dirty = False
+                if key is None:
+                    keys = self._dirty_keys
+                    self._dirty_keys = set()
+                elif key in self._dirty_keys:
+                    self._dirty_keys.discard(key)
+                    keys = [key]
+                else:
+                    return
 
-            if key is None:
-                # remove all InvalidObjects
-                delete_keys = [
-                    k for k in _objs if _objs[k] == _invalid_object
+                snapshot = [
+                    (k, self._objects[k], self._pickled.pop(k, None))
+                    for k in keys if k in self._objects
                 ]
 
-                for k in delete_keys:
-                    del _objs[k]
-                    file_path = os.path.join(self.cache_path, key)
+            # only the files of the invalidated keys are removed; the cache
+            # folder itself is left alone, as the values of other keys may
+            # only be on disk, e.g., after being evicted, and the global
+            # cache folder is shared with the bib caches
+            for k, obj, pickled in snapshot:
+                if _is_invalid(obj):
+                    file_path = os.path.join(self.cache_path, k)
                     try:
-                        os.path.remove(file_path)
+                        os.remove(file_path)
                     except OSError:
                         pass
-
-                if _objs:
-                    make_dirs(self.cache_path)
-                    for k in _objs.keys():
-                        try:
-                            self._write(k, _objs)
-                        except:
-                            traceback.print_exc()
                 else:
-                    # cache has been emptied, so remove it
                     try:
-                        shutil.rmtree(self.cache_path)
+                        make_dirs(self.cache_path)
+                        if pickled is not None and pickled[0] is obj:
+                            self._write(k, obj, pickled[1])
+                        else:
+                            self._write(k, obj)
                     except:
-                        print(
-                            'error while deleting {0}'.format(self.cache_path))
                         traceback.print_exc()
-            elif key in _objs:
-                if _objs[key] == _invalid_object:
-                    file_path = os.path.join(self.cache_path, key)
-                    try:
-                        os.path.remove(file_path)
-                    except:
-                        print('error while deleting {0}'.format(file_path))
-                        traceback.print_exc()
-                else:
-                    make_dirs(self.cache_path)
-                    self._write(key, _objs)
+                        # the value must not be evicted, as the file is
+                        # outdated, and is written again by the next save
+                        with self._write_lock:
+                            self._dirty_keys.add(k)
+
+        # the values which have been saved can be evicted now
+        _memory_budget.enforce()
 
     def save_async(self, key=None):
         '''
         an async version of save; does the save in a new thread
         '''
         try:
-            self._pool.apply_async(self.save, key)
+            self._pool.apply_async(self.save, (key,))
         except ValueError:
             pass
 
-    def _write(self, key, obj):
-        try:
-            _obj = obj[key]
-        except KeyError:
-            raise CacheMiss()
-
+    def _write(self, key, obj, data=None):
+        '''
+        writes obj to the file for key; data, if given, is obj already
+        pickled
+        '''
         try:
             with open(os.path.join(self.cache_path, key), 'wb') as f:
-                pickle.dump(_obj, f, protocol=-1)
+                if data is None:
+                    pickle.dump(obj, f, protocol=-1)
+                else:
+                    f.write(data)
         except OSError:
             print('error while writing to {0}'.format(key))
             traceback.print_exc()
             raise CacheMiss()
 
-    def _schedule_save(self):
-        with self._save_lock:
-            self._save_queue.append(0)
-            threading.Timer(0.5, self._debounce_save).start()
-
-    def _debounce_save(self):
-        with self._save_lock:
-            if len(self._save_queue) > 1:
-                self._save_queue.pop()
+    def _set_object(self, key, obj, data=None):
+        '''
+        stores obj as the value of key and schedules saving it
+
+        :param data:
+            obj already pickled, if it has been
+        '''
+        with self._write_lock:
+            self._objects[key] = obj
+            if data is None:
+                self._pickled.pop(key, None)
             else:
-                self._save_queue = []
-                sublime.set_timeout(self.save_async, 0)
+                self._pickled[key] = (obj, data)
+            self._dirty_keys.add(key)
+
+        _memory_budget.track(self, key, obj)
+        self._schedule_save()
+
+    def _schedule_save(self):
+        _save_scheduler.schedule(self)
 
     # ensure cache is saved to disk when removed from memory
     def __del__(self):
         self.save_async()
-        self._pool.terminate()
 
 
 class GlobalCache(Cache):
@@ -669,7 +938,10 @@ class InstanceTrackingCache(Cache):
 
             if ref_count <= 0:
                 self.save_async()
-                self._pool.terminate()
+                # values of the state which are still being tracked on the
+                # I/O pool are not added to the budget after this
+                self._released = True
+                _memory_budget.discard(self)
                 del self._REF_COUNTS[inst_key]
                 del self._INSTANCES[inst_key]
 
@@ -0,0 +1,109 @@
+from .. import bibcache
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+SETTINGS = {
+    'cite_panel_format': ['{author_short} {year} - {title_short}', '{title}'],
+    'cite_autocomplete_format': '{keyword}: {title}',
+    'bib_lazy_formatting': False
+}
+
+ENTRIES = [
+    {'keyword': 'doe2000', 'title': 'A Title', 'author': 'Doe, John'},
+    {'keyword': 'roe2010', 'title': 'Another Title', 'author': 'Roe, Jane'}
+]
+
+
+def get_setting(setting, default=None, view=None):
+    return SETTINGS.get(setting, default)
+
+
+class TestBibCache(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(bibcache, 'get_setting', get_setting)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.bib_file = os.path.join(self.temp_dir, 'test.bib')
+        self.write_bib_file('@misc{doe2000}')
+
+        self.addCleanup(self.invalidate)
+
+    def invalidate(self):
+        bib_cache = bibcache.BibCache('test', self.bib_file)
+        bib_cache.invalidate(bib_cache.formatted_cache_name)
+
+    def write_bib_file(self, contents):
+        with open(self.bib_file, 'w') as f:
+            f.write(contents)
+
+        _, fingerprint = bibcache.read_bib_file(self.bib_file)
+        bibcache.BibCache('test', self.bib_file).set(ENTRIES, fingerprint)
+
+    def wait_for_saves(self):
+        # the BibCache is kept alive until it has been saved, which happens
+        # on the I/O pool after SAVE_DELAY
+        time.sleep(2 * bibcache.cache.SAVE_DELAY)
+        bibcache.cache._get_io_pool()._task_queue.join()
+
+    def get_generation(self):
+        return bibcache.get_generation('test', [self.bib_file])
+
+    def test_generation_is_kept(self):
+        generation = self.get_generation()
+
+        self.assertIsNotNone(generation)
+        self.assertEqual(self.get_generation(), generation)
+
+    def test_generation_is_kept_when_entries_are_loaded_again(self):
+        generation = self.get_generation()
+
+        # as happens when the entries are evicted to keep within the budget
+        bib_cache = bibcache.BibCache('test', self.bib_file)
+        bib_cache._objects.pop(bib_cache.formatted_cache_name, None)
+        del bib_cache
+
+        self.assertEqual(self.get_generation(), generation)
+
+    def test_generation_is_kept_without_loading_entries(self):
+        generation = self.get_generation()
+
+        with mock.patch.object(bibcache.BibCache, 'get') as get:
+            self.assertEqual(self.get_generation(), generation)
+            self.assertFalse(get.called)
+
+    def test_generation_changes_with_bib_file(self):
+        generation = self.get_generation()
+        self.write_bib_file('@misc{doe2000}\n@misc{roe2010}')
+
+        self.assertNotEqual(self.get_generation(), generation)
+
+    def test_generation_changes_with_formats(self):
+        generation = self.get_generation()
+        with mock.patch.dict(
+                SETTINGS, cite_autocomplete_format='{keyword}'):
+            self.assertNotEqual(self.get_generation(), generation)
+
+    def test_prefix_index_is_kept(self):
+        with mock.patch.object(
+                bibcache.bibindex, 'PrefixIndex',
+                wraps=bibcache.bibindex.PrefixIndex) as prefix_index:
+            first = bibcache.BibCache('test', self.bib_file).find('doe')
+            self.wait_for_saves()
+            second = bibcache.BibCache('test', self.bib_file).find('doe')
+
+        self.assertEqual(prefix_index.call_count, 1)
+        self.assertEqual(second, first)
+        self.assertEqual([entry['keyword'] for entry in first], ['doe2000'])
@@ -0,0 +1,97 @@
+from ..bibformat import (
+    CompletionWrapper, compile_format, format_entries, format_entry,
+    formatter
+)
+
+import unittest
+
+ENTRIES = [
+    {
+        'keyword': 'key1',
+        'author': 'Doe, John and Roe, Jane',
+        'title': 'A Title: With a Subtitle',
+        'year': '2000',
+        'journal': '100% Journal'
+    },
+    {
+        'citekey': 'key2',
+        'editor': 'Smith, Anna',
+        'date': '2010-05-01',
+        'shorttitle': 'Short %s {title}'
+    },
+    {}
+]
+
+
+class TestFormatEntry(unittest.TestCase):
+
+    def assertSameAsVformat(self, format_string):
+        for entry in ENTRIES:
+            try:
+                expected = formatter.vformat(
+                    format_string, (), CompletionWrapper(entry)
+                )
+            except Exception as e:
+                with self.assertRaises(type(e)) as error:
+                    format_entry(format_string, entry)
+                self.assertEqual(str(error.exception), str(e))
+            else:
+                self.assertEqual(
+                    format_entry(format_string, entry), expected,
+                    repr(format_string)
+                )
+                self.assertEqual(
+                    format_entries(format_string, [entry]), [expected]
+                )
+
+    def test_plain_fields(self):
+        self.assertSameAsVformat(
+            '{keyword}: {author_short} - {title_short} ({year})'
+        )
+        self.assertSameAsVformat('{title}{journal}{month}')
+        self.assertSameAsVformat('{editor_short}')
+
+    def test_percent_signs(self):
+        self.assertSameAsVformat('100% {title}')
+        self.assertSameAsVformat('%s %d %% {year}%')
+        self.assertSameAsVformat('%(title)s')
+        self.assertSameAsVformat('%')
+
+    def test_escaped_brackets(self):
+        self.assertSameAsVformat('{{title}}')
+        self.assertSameAsVformat('{{{title}}} }} {{')
+        self.assertSameAsVformat('{{%s}}')
+
+    def test_no_fields(self):
+        self.assertSameAsVformat('')
+        self.assertSameAsVformat('just text')
+
+    def test_positional_fields(self):
+        self.assertSameAsVformat('{}')
+        self.assertSameAsVformat('{0}')
+        self.assertSameAsVformat('{title} {1}')
+
+    def test_attributes_and_indices(self):
+        self.assertSameAsVformat('{title[0]}')
+        self.assertSameAsVformat('{title.upper}')
+
+    def test_format_specs(self):
+        self.assertSameAsVformat('{title:>40}')
+        self.assertSameAsVformat('{year:.2}|{title:{year}}')
+        self.assertSameAsVformat('{title:d}')
+
+    def test_conversions(self):
+        self.assertSameAsVformat('{title!r}')
+        self.assertSameAsVformat('{author!s:10}')
+        self.assertSameAsVformat('{title!x}')
+
+    def test_malformed_brackets(self):
+        self.assertSameAsVformat('{title')
+        self.assertSameAsVformat('title}')
+        self.assertSameAsVformat('{title}}')
+        self.assertSameAsVformat('{{title}')
+        self.assertSameAsVformat('{')
+        self.assertSameAsVformat('}')
+
+    def test_compiled_once(self):
+        self.assertIs(compile_format('{title}'), compile_format('{title}'))
@@ -0,0 +1,69 @@
+from ..bibindex import PrefixIndex, filter_entries
+
+import random
+import unittest
+
+ENTRIES = [
+    {'keyword': 'doe2000', 'title': 'A Title', 'author': 'Doe, John'},
+    {'keyword': 'roe2010', 'title': 'Another title', 'author': 'Roe, Jane'},
+    {'keyword': 'smith', 'title': 'Caf\xe9 Culture\xa0Today'},
+    {'keyword': 'x', 'title': 'Tab\tseparated words'},
+    {'<prefix_match>': 'precomputed string doe'},
+    {'keyword': 'empty'},
+    {}
+]
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def assertSameAsFilter(self, entries, lower_prefix):
+        self.assertEqual(
+            PrefixIndex(entries).search(lower_prefix),
+            filter_entries(entries, lower_prefix),
+            repr(lower_prefix)
+        )
+
+    def test_empty_prefix(self):
+        self.assertSameAsFilter(ENTRIES, '')
+        self.assertSameAsFilter([], '')
+
+    def test_short_prefixes(self):
+        for lower_prefix in ('d', 'e', 'oe', '20', 'xx', '\xe9', 'y'):
+            self.assertSameAsFilter(ENTRIES, lower_prefix)
+
+    def test_prefixes(self):
+        for lower_prefix in ('doe', 'title', 'another', 'roe2010', 'caf\xe9'):
+            self.assertSameAsFilter(ENTRIES, lower_prefix)
+
+    def test_prefixes_with_whitespace(self):
+        for lower_prefix in (
+            ' ', '  ', 'a title', 'title ', ' doe', 'doe, john', 'e t',
+            'title doe', 'caf\xe9 culture', 'culture\xa0today', '\xa0',
+            'tab\tseparated', ' words', 'separated words', '\t'
+        ):
+            self.assertSameAsFilter(ENTRIES, lower_prefix)
+
+    def test_prefixes_with_unknown_trigrams(self):
+        for lower_prefix in ('qqq', 'doez', 'titles', 'zz title'):
+            self.assertSameAsFilter(ENTRIES, lower_prefix)
+            self.assertEqual(PrefixIndex(ENTRIES).search(lower_prefix), [])
+
+    def test_same_as_filter(self):
+        r = random.Random(0)
+        chars = 'abc \t\xa0 ,'
+        entries = [
+            {'<prefix_match>': ''.join(
+                r.choice(chars) for _ in range(r.randint(0, 20))
+            )}
+            for _ in range(200)
+        ]
+        index = PrefixIndex(entries)
+        for _ in range(2000):
+            lower_prefix = ''.join(
+                r.choice(chars) for _ in range(r.randint(0, 5))
+            )
+            self.assertEqual(
+                index.search(lower_prefix),
+                filter_entries(entries, lower_prefix),
+                repr(lower_prefix)
+            )
@@ -0,0 +1,65 @@
+from .. import cache
+
+import threading
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class FakeCache(object):
+
+    def __init__(self, **objects):
+        self._objects = objects
+        self._write_lock = threading.Lock()
+        self._dirty_keys = set()
+
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.budget = cache._MemoryBudget()
+
+        # a budget of a single byte, so that all but the most recently used
+        # value are evicted
+        def get_setting(setting, default=None):
+            return 1.0 / (1 << 20)
+
+        patcher = mock.patch.object(cache, 'get_setting', get_setting)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_recently_used_values_are_evicted(self):
+        fake = FakeCache(a=['a'], b=['b'])
+        self.budget._add(fake.__dict__, 'a', fake._objects['a'])
+        self.budget._add(fake.__dict__, 'b', fake._objects['b'])
+
+        self.assertEqual(list(fake._objects), ['b'])
+        self.assertEqual(list(self.budget.get_usage(fake)), ['b'])
+
+    def test_unsaved_values_are_not_evicted(self):
+        fake = FakeCache(a=['a'], b=['b'])
+        fake._dirty_keys.add('a')
+        self.budget._add(fake.__dict__, 'a', fake._objects['a'])
+        self.budget._add(fake.__dict__, 'b', fake._objects['b'])
+
+        self.assertEqual(sorted(fake._objects), ['a', 'b'])
+
+    def test_derived_attributes_are_dropped(self):
+        fake = FakeCache(a=['a'], b=['b'])
+        fake._derived_attributes = {'a': ('_index',)}
+        fake._index = fake._objects['a']
+        self.budget._add(fake.__dict__, 'a', fake._objects['a'])
+        self.budget._add(fake.__dict__, 'b', fake._objects['b'])
+
+        self.assertIsNone(fake._index)
+
+    def test_values_of_released_caches_are_not_tracked(self):
+        fake = FakeCache(a=['a'])
+        fake._released = True
+        self.budget._add(fake.__dict__, 'a', fake._objects['a'])
+
+        self.assertEqual(self.budget.get_usage(fake), {})
+        self.assertEqual(self.budget._total, 0)
@@ -0,0 +1,44 @@
+from ..utils import ThreadPool
+
+import threading
+import unittest
+
+
+class TestThreadPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ThreadPool(1, max_queue_size=1)
+        self.addCleanup(self.pool.join, 1)
+        self.addCleanup(self.pool.terminate, True)
+
+    def test_results(self):
+        self.assertEqual(self.pool.submit(sum, (1, 2)).get(1), 3)
+        self.assertEqual(self.pool.apply_async(max, (1, 2)).result(1), 2)
+
+    def test_cancelled_task_makes_room_in_queue(self):
+        running = threading.Event()
+        release = threading.Event()
+
+        def block():
+            running.set()
+            release.wait(5)
+
+        self.addCleanup(release.set)
+        self.pool.submit(block)
+        self.assertTrue(running.wait(1))
+        queued = self.pool.submit(int)
+
+        submitted = threading.Event()
+
+        def submit():
+            self.pool.submit(int)
+            submitted.set()
+
+        thread = threading.Thread(target=submit)
+        thread.daemon = True
+        thread.start()
+        self.assertFalse(submitted.wait(0.1))
+
+        self.assertTrue(queued.cancel())
+        self.assertTrue(submitted.wait(1))
+        self.assertTrue(queued.cancelled())
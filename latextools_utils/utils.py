@@ -1,9 +1,8 @@
 import sublime
 import codecs
-import itertools
 import sys
 import threading
-import time
+import types
 
 try:
     from os import cpu_count
@@ -16,12 +15,15 @@ except ImportError:
             return 1
 
 try:
-    from Queue import Queue
+    from Queue import Empty, Queue
 except ImportError:
-    from queue import Queue
+    from queue import Empty, Queue
+
+from concurrent.futures import (
+    CancelledError, Future, TimeoutError as FutureTimeoutError
+)
 
 _ST3 = True
-from .six import reraise
 
 
 def run_after_loading(view, func):
@@ -126,6 +128,90 @@ def get_file_content(file_name, encoding="utf8", ignore=True,
     return content
 
 
+# objects which are not part of the data they are referenced by
+_SHARED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType
+)
+
+# objects which do not reference any others
+_ATOMIC_TYPES = (
+    bytes, bytearray, str, int, float, complex, bool, type(None)
+)
+
+
+# lists and tuples with more items than this are estimated from a sample of
+# that many items
+ESTIMATE_SAMPLE_SIZE = 100
+
+
+def estimate_size(obj):
+    '''
+    returns an estimate of the number of bytes used by obj and all objects
+    it references, counting each object only once
+
+    the contents of containers, the __dict__ and the __slots__ of objects are
+    followed; classes, modules and functions are not counted
+
+    the items of long lists and tuples, e.g., the entries of a bib file, tend
+    to be alike, so only an evenly spaced sample of them is followed and the
+    result scaled up to all of them
+    '''
+    return _estimate_size([obj], set())
+
+
+def _estimate_size(stack, seen):
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+
+        try:
+            size += sys.getsizeof(obj)
+        except TypeError:
+            continue
+
+        if isinstance(obj, _ATOMIC_TYPES):
+            continue
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif (
+            isinstance(obj, (list, tuple)) and
+            len(obj) > ESTIMATE_SAMPLE_SIZE
+        ):
+            step = len(obj) / ESTIMATE_SAMPLE_SIZE
+            sample = [
+                obj[int(i * step)] for i in range(ESTIMATE_SAMPLE_SIZE)
+            ]
+            size += (
+                _estimate_size(sample, seen) * len(obj) //
+                ESTIMATE_SAMPLE_SIZE
+            )
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+
+        try:
+            stack.append(obj.__dict__)
+        except AttributeError:
+            pass
+
+        for cls in type(obj).__mro__:
+            slots = cls.__dict__.get('__slots__', ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            for slot in slots:
+                try:
+                    stack.append(getattr(obj, slot))
+                except AttributeError:
+                    pass
+
+    return size
+
+
 class TimeoutError(Exception):
     pass
 
@@ -181,125 +267,121 @@ class ThreadPool(object):
     '''A relatively simple ThreadPool designed to maintain a number of thread
     workers
 
-    By default, each pool manages a number of processes equal to the number
+    By default, each pool manages a number of threads equal to the number
     of CPU cores. This can be adjusted by setting the processes parameter
     when creating the pool.
 
-    Returned results are similar to multiprocessing.pool.AsyncResult'''
+    The workers block on the task queue, so an idle pool does not wake up at
+    all. If max_queue_size is given, at most that many tasks wait in the
+    queue; apply_async() then blocks until there is room.
+
+    Returned results are concurrent.futures.Future objects which also offer
+    the interface of multiprocessing.pool.AsyncResult; a task which has not
+    started yet can be cancelled with cancel(), which also makes room for
+    another task in the queue'''
 
-    def __init__(self, processes=None):
+    def __init__(self, processes=None, max_queue_size=0):
         self._task_queue = Queue()
-        self._result_queue = Queue()
+        # limits the number of waiting tasks; the sentinels which stop the
+        # workers do not count, so that terminate() never blocks
+        if max_queue_size > 0:
+            self._queue_slots = threading.BoundedSemaphore(max_queue_size)
+        else:
+            self._queue_slots = None
         # used to indicate if the ThreadPool should be stopped
         self._should_stop = threading.Event()
+        self._stop_lock = threading.Lock()
 
-        # default value is two less than the number of CPU cores to handle
-        # the supervisor thread and result thread
-        self._processes = max(processes or (cpu_count() or 3) - 2, 1)
+        self._processes = max(processes or cpu_count() or 1, 1)
         self._workers = []
-        self._populate_pool()
+        for _ in range(self._processes):
+            w = _ThreadPoolWorker(self._task_queue, self._queue_slots)
+            w.name = u'{0!r} worker'.format(self)
+            self._workers.append(w)
+            w.start()
 
-        self._job_counter = itertools.count()
-        self._result_cache = {}
+    # - Public API
+    def apply_async(self, func, args=(), kwargs={}):
+        '''
+        runs func(*args, **kwargs) on one of the workers, returning a
+        _ThreadPoolResult for the result
 
-        self._result_handler = threading.Thread(target=self._handle_results)
-        self._result_handler.daemon = True
-        self._result_handler.name = u'{0!r} handler'.format(self)
-        self._result_handler.start()
+        raises ValueError if the pool has been terminated
+        '''
+        if self._queue_slots is not None:
+            self._queue_slots.acquire()
 
-        self._supervisor = threading.Thread(target=self._maintain_pool)
-        self._supervisor.daemon = True
-        self._supervisor.name = u'{0!r} supervisor'.format(self)
-        self._supervisor.start()
+        with self._stop_lock:
+            if not self.is_running():
+                if self._queue_slots is not None:
+                    self._queue_slots.release()
+                raise ValueError('the ThreadPool has been terminated')
 
-    # - Public API
-    def apply_async(self, func, args=(), kwargs={}):
-        job = next(self._job_counter)
-        self._task_queue.put((job, (func, args, kwargs)))
-        return _ThreadPoolResult(job, self._result_cache)
+            result = _ThreadPoolResult(self._queue_slots)
+            self._task_queue.put((result, func, args, kwargs))
+        return result
+
+    def submit(self, func, *args, **kwargs):
+        '''like concurrent.futures.Executor.submit()'''
+        return self.apply_async(func, args, kwargs)
 
     def is_running(self):
         return not self._should_stop.is_set()
 
-    def terminate(self):
+    def terminate(self, cancel_pending=False):
         '''Stops this thread pool. Note stopping is not immediate. If you
         need to wait for the termination to complete, you should call join()
-        after this.'''
-        self._should_stop.set()
+        after this.
 
-    def join(self, timeout=None):
-        self._supervisor.join(timeout)
-        if self._supervisor.is_alive():
-            raise TimeoutError
+        The tasks already queued are still run, unless cancel_pending is
+        True.'''
+        with self._stop_lock:
+            if not self.is_running():
+                return
+            self._should_stop.set()
 
-    # - Internal API
-    # this is the supervisory task, which will clear workers that have stopped
-    # and start fresh workers
-    def _maintain_pool(self):
-        while self.is_running():
-            cleared_processes = False
-            for i in reversed(range(len(self._workers))):
-                w = self._workers[i]
-                if not w.is_alive():
-                    w.join()
-                    cleared_processes = True
-                    del self._workers[i]
-
-            if cleared_processes:
-                self._populate_pool()
-
-            time.sleep(0.1)
-
-        # send sentinels to end threads
-        for _ in range(len(self._workers)):
-            self._task_queue.put(None)
-
-        # ensure worker threads end
-        for w in self._workers:
-            w.join()
+            if cancel_pending:
+                self._cancel_pending()
 
-        # stop the result handler
-        self._result_queue.put(None)
-        self._result_handler.join()
+            # send sentinels to end threads
+            for _ in self._workers:
+                self._task_queue.put(None)
 
-    def _handle_results(self):
-        while True:
-            result = self._result_queue.get()
-            if result is None:
-                break
+    def join(self, timeout=None):
+        for w in self._workers:
+            w.join(timeout)
+            if w.is_alive():
+                raise TimeoutError
 
-            job, _result = result
+    # - Internal API
+    def _cancel_pending(self):
+        while True:
             try:
-                result_handler = self._result_cache.get(job)
-                if result_handler:
-                    result_handler._set_result(_result)
-            finally:
-                self._result_queue.task_done()
+                task = self._task_queue.get_nowait()
+            except Empty:
+                break
 
-    # creates and adds worker threads
-    def _populate_pool(self):
-        for _ in range(self._processes - len(self._workers)):
-            w = _ThreadPoolWorker(self._task_queue, self._result_queue)
-            self._workers.append(w)
-            w.start()
+            self._task_queue.task_done()
+            task[0].cancel()
 
 
 class _ThreadPoolWorker(threading.Thread):
 
-    def __init__(self, task_queue, result_queue, *args, **kwargs):
+    def __init__(self, task_queue, queue_slots, *args, **kwargs):
         super(_ThreadPoolWorker, self).__init__(*args, **kwargs)
         self.daemon = True
         self._task_queue = task_queue
-        self._result_queue = result_queue
+        self._queue_slots = queue_slots
 
     def run(self):
         while True:
             task = self._task_queue.get()
             if task is None:
+                self._task_queue.task_done()
                 break
 
-            job = task[0]
-            func, args, kwargs = task[1]
+            result, func, args, kwargs = task
+            result._release_queue_slot()
 
             if args is None:
                 args = ()
@@ -307,47 +389,55 @@ class _ThreadPoolWorker(threading.Thread):
                 kwargs = {}
 
             try:
-                self._result_queue.put((job, func(*args, **kwargs)))
-            except Exception:
-                self._result_queue.put((job, sys.exc_info()))
+                # skip tasks cancelled while they were queued
+                if result.set_running_or_notify_cancel():
+                    try:
+                        result.set_result(func(*args, **kwargs))
+                    except Exception as e:
+                        result.set_exception(e)
             finally:
+                # the task is not kept alive while waiting for the next one
+                del task, result, func, args, kwargs
                 self._task_queue.task_done()
 
 
-class _ThreadPoolResult(object):
+class _ThreadPoolResult(Future):
+
+    def __init__(self, queue_slots=None):
+        super(_ThreadPoolResult, self).__init__()
+        # the semaphore the task holds a slot of while it is queued
+        self._queue_slots = queue_slots
+        self._queue_slots_lock = threading.Lock()
+
+    def cancel(self):
+        cancelled = super(_ThreadPoolResult, self).cancel()
+        if cancelled:
+            self._release_queue_slot()
+        return cancelled
 
-    def __init__(self, job, result_cache):
-        self._ready = threading.Event()
-        self._value = None
-        self._result_cache = result_cache
-        self._job = job
-        self._result_cache[job] = self
+    def _release_queue_slot(self):
+        # called when a worker takes the task from the queue and when the
+        # task is cancelled, whichever comes first
+        with self._queue_slots_lock:
+            queue_slots, self._queue_slots = self._queue_slots, None
+        if queue_slots is not None:
+            queue_slots.release()
 
     def ready(self):
-        return self._ready.is_set()
+        return self.done()
 
     def wait(self, timeout=None):
-        self._ready.wait(timeout)
+        try:
+            self.exception(timeout)
+        except (FutureTimeoutError, CancelledError):
+            pass
 
     def get(self, timeout=None):
         self.wait(timeout)
         if not self.ready():
             raise TimeoutError
 
-        # handle an exception, which is passed as a sys.exc_info tuple
-        if (
-            isinstance(self._value, tuple) and
-            len(self._value) == 3 and
-            issubclass(self._value[0], Exception)
-        ):
-            reraise(*self._value)
-        else:
-            return self._value
+        return self.result()
 
     def then(self, callback, timeout=None):
         callback(self.get(timeout))
-
-    def _set_result(self, _value):
-        self._value = _value
-        self._ready.set()
-        del self._result_cache[self._job]